@@ -0,0 +1,188 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import _period_ordinals, _value_codes, compute_cohort_matrices, count_values
+
+# Approximate mode: estimates with 95% error bounds instead of exact scans.
+# Below APPROX_ROW_THRESHOLD rows everything stays exact (zero error).
+APPROXIMATE = os.environ.get("DASHBOARD_APPROXIMATE", "0") == "1"
+APPROX_ROW_THRESHOLD = 1_000_000
+SAMPLE_SIZE = 100_000
+APPROX_STRATA = ['is_returning_customer', 'payment_method']
+COHORT_SAMPLE_RATE = 0.05
+# 2**12 registers: ~1.6% standard error in 4 KiB per sketch
+HLL_PRECISION = 12
+Z_95 = 1.96
+
+
+def hash_values(values):
+    # Stable 64-bit hashes, identical across processes and partitions. Values
+    # are hashed in their own dtype; a categorical hashes each category once
+    # and gathers the hashes by code.
+    return pd.util.hash_pandas_object(pd.Series(values, copy=False), index=False).to_numpy()
+
+
+def _bit_length(values):
+    lengths = np.zeros(len(values), dtype=np.int64)
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >= (np.uint64(1) << np.uint64(shift))
+        lengths[high] += shift
+        values[high] >>= np.uint64(shift)
+    return lengths + (values > 0)
+
+
+class HyperLogLog:
+    # Distinct-count sketch. Sketches of the same precision merge by taking
+    # the register-wise maximum, so per-partition or per-chunk sketches can be
+    # combined without revisiting the rows.
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        return self.add_hashes(hash_values(values))
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        rest = hashes & np.uint64((1 << width) - 1)
+        ranks = (width - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, ranks)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge sketches of precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction: linear counting on the empty registers
+            return m * np.log(m / zeros)
+        return raw
+
+    def bounds(self, z=Z_95):
+        estimate = self.estimate()
+        return estimate * (1 - z * self.relative_error), estimate * (1 + z * self.relative_error)
+
+
+def period_sketches(df, freq='M', column='customer_id', precision=HLL_PRECISION):
+    # {Period: HyperLogLog of `column`} per purchase_date period, mergeable with
+    # merge_sketches across partitions
+    dates = df['purchase_date'].to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(dates)
+    periods = _period_ordinals(dates[valid], freq)
+    hashes = hash_values(df[column][valid])
+    # One sort groups the rows by period; each sketch reads a contiguous slice
+    order = np.argsort(periods, kind='stable')
+    ordinals, starts = np.unique(periods[order], return_index=True)
+    bounds = np.append(starts, len(order))
+    return {period: HyperLogLog(precision).add_hashes(hashes[order[start:stop]])
+            for period, start, stop in zip(pd.PeriodIndex.from_ordinals(ordinals, freq=freq), bounds[:-1], bounds[1:])}
+
+
+def merge_sketches(*sketch_maps):
+    merged = {}
+    for sketches in sketch_maps:
+        for key, sketch in sketches.items():
+            if key in merged:
+                merged[key].merge(sketch)
+            else:
+                merged[key] = HyperLogLog(sketch.precision).merge(sketch)
+    return merged
+
+
+def union_sketch(sketches, precision=HLL_PRECISION):
+    # One sketch of everything in a {key: HyperLogLog} map
+    union = HyperLogLog(precision)
+    for sketch in sketches.values():
+        union.merge(sketch)
+    return union
+
+
+def sketch_estimates(sketches, z=Z_95):
+    # Estimate and error-bound table for a {key: HyperLogLog} map
+    rows = {key: (sketch.estimate(), *sketch.bounds(z)) for key, sketch in sorted(sketches.items())}
+    return pd.DataFrame.from_dict(rows, orient='index', columns=['estimate', 'low', 'high'])
+
+
+def stratum_codes(df, strata=APPROX_STRATA):
+    # One int code per row for the combination of the `strata` columns
+    codes = np.zeros(len(df), dtype=np.int64)
+    for col in strata:
+        if col in df.columns:
+            col_codes, labels = _value_codes(df[col])
+            # Missing values form their own stratum
+            codes = codes * (len(labels) + 1) + np.where(col_codes < 0, len(labels), col_codes)
+    return codes
+
+
+def stratified_sample(df, strata=APPROX_STRATA, size=SAMPLE_SIZE, random_state=42):
+    # Stratified Poisson sample of about `size` rows: each stratum is sampled
+    # at its own rate (proportional allocation, at least ~2 rows expected per
+    # stratum), in one O(n) pass. Returns the sampled row positions, their
+    # stratum codes and the stratum sizes in the full frame.
+    codes = stratum_codes(df, strata)
+    stratum_sizes = np.bincount(codes) if len(codes) else np.zeros(0, dtype=np.int64)
+    rate = min(1.0, size / max(len(df), 1))
+    rates = np.minimum(1.0, np.maximum(rate, 2.0 / np.maximum(stratum_sizes, 1)))
+    rng = np.random.default_rng(random_state)
+    positions = np.flatnonzero(rng.random(len(df)) < rates[codes])
+    return positions, codes[positions], stratum_sizes
+
+
+def estimate_counts(values, codes, stratum_sizes, z=Z_95):
+    # Population counts of each distinct value from a stratified sample of
+    # `values` (with stratum `codes`), with the 95% half-width from the
+    # stratified variance of a proportion
+    counts = count_values({'stratum': pd.Series(codes), 'value': pd.Series(values).reset_index(drop=True)},
+                          [], crosstabs=[('stratum', 'value')])
+    grid = counts[('stratum', 'value')]
+    grid = grid[grid.sum(axis=1) > 0]
+    population = stratum_sizes[grid.index.to_numpy()].astype('float64')
+    taken = grid.sum(axis=1).to_numpy(dtype='float64')
+    shares = grid.to_numpy(dtype='float64') / taken[:, None]
+    estimate = (population[:, None] * shares).sum(axis=0)
+    finite = np.clip(1 - taken / population, 0, None)
+    variance = (population ** 2 * finite / np.maximum(taken - 1, 1))[:, None] * shares * (1 - shares)
+    error = z * np.sqrt(variance.sum(axis=0))
+    return pd.DataFrame({'estimate': estimate, 'error': error}, index=grid.columns.rename(getattr(values, 'name', None)))
+
+
+def approximate_counts(df, column, threshold=APPROX_ROW_THRESHOLD, size=SAMPLE_SIZE, strata=APPROX_STRATA):
+    # Value counts of `column`: exact (zero error) up to `threshold` rows,
+    # estimated from a stratified sample above it
+    if len(df) <= threshold:
+        counts = count_values(df, [column])[column].astype('float64')
+        return pd.DataFrame({'estimate': counts, 'error': 0.0})
+    positions, codes, sizes = stratified_sample(df, strata, size)
+    return estimate_counts(df[column].take(positions), codes, sizes)
+
+
+def approx_cohort_matrices(df, freq='M', sample_rate=COHORT_SAMPLE_RATE, threshold=APPROX_ROW_THRESHOLD, z=Z_95):
+    # Cohort counts from the customers whose id hashes into a `sample_rate`
+    # slice, scaled up. Sampling whole customers keeps each sampled customer's
+    # full history, and the hash makes the sample identical across partitions.
+    # Returns (counts, retention, error) with `error` the 95% half-width per
+    # cell; exact (zero error) up to `threshold` rows.
+    if len(df) <= threshold:
+        counts, retention = compute_cohort_matrices(df, freq)
+        return counts, retention, counts * 0.0
+    keep = hash_values(df['customer_id']) < np.uint64(sample_rate * 2.0 ** 64)
+    counts, retention = compute_cohort_matrices(df[keep], freq)
+    error = z * np.sqrt(counts * (1 - sample_rate)) / sample_rate
+    return counts / sample_rate, retention, error
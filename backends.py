@@ -0,0 +1,450 @@
+import os
+import uuid
+import threading
+import sqlite3
+from collections import OrderedDict
+
+import pandas as pd
+
+from cube import CUSTOMER_TYPE_LABELS, TransactionCube, rows_as_cells, summarize
+from filters import FilterEngine
+from shared_cache import SharedCache, estimate_size
+from streaming import iter_csv_chunks
+from utils import (CACHE_DIR, DATA_PATH, count_values, export_data, export_frames, load_data, optimize_dtypes,
+                   page_rows, raw_data_order, source_version)
+
+# Query backend for the dashboard: "pandas" keeps the dataset in memory,
+# "sqlite" / "duckdb" push filters and aggregations down to an embedded
+# database file and only pull back small result sets.
+BACKEND = os.environ.get("DASHBOARD_BACKEND", "pandas")
+DB_PATH = os.environ.get("DASHBOARD_DB_PATH")
+TABLE = 'transactions'
+INGEST_CHUNK_SIZE = 200_000
+EXPORT_CHUNK_SIZE = 100_000
+OPTION_COLUMNS = ['gender', 'category', 'payment_method']
+# Row-level distributions the cube cannot answer, counted together per spec
+ROW_COUNT_COLUMNS = ['previous_purchases', 'frequency_of_purchases']
+CHURN_CROSSTAB = ('previous_purchases', 'is_returning_customer')
+
+
+class PandasBackend:
+    # Filtered views, counts, summaries and raw-data orderings go through a
+    # SharedCache under `scope` = (namespace, version, ...). Backends built on
+    # the same data can share one cache across sessions; by default each
+    # backend gets a private one.
+    name = 'pandas'
+
+    def __init__(self, df, cache=None, scope=None, cube=None):
+        self.df = df
+        self.engine = FilterEngine(df, cache_size=0)
+        self.cube = cube if cube is not None else TransactionCube(df)
+        self.cache = cache if cache is not None else SharedCache()
+        self.scope = scope if scope is not None else (uuid.uuid4().hex, None)
+
+    def append(self, df, tail, scope=None):
+        # Backend for `df` = this backend's rows plus `tail`, folding the tail
+        # into a copy of this cube instead of re-aggregating every row
+        return PandasBackend(df, cache=self.cache, scope=scope, cube=self.cube.append(df, tail))
+
+    def options(self):
+        df = self.df
+        options = {
+            'columns': list(df.columns),
+            'date_bounds': (df['purchase_date'].min(), df['purchase_date'].max()),
+            'age_bounds': (int(df['age'].min()), int(df['age'].max())) if 'age' in df.columns else None,
+            'price_bounds': (float(df['price'].min()), float(df['price'].max())) if 'price' in df.columns else None,
+            'max_previous_purchases': int(df['previous_purchases'].max()),
+        }
+        for column in OPTION_COLUMNS:
+            options[column] = sorted(df[column].dropna().unique().tolist()) if column in df.columns else []
+        return options
+
+    def _cached(self, kind, key, compute, sizeof=None):
+        return self.cache.get((self.scope, kind, key), compute, sizeof)
+
+    def rows(self, spec=None):
+        if spec is None:
+            return self.df
+        # Views that share the base frame's memory only cost the cache's
+        # per-entry minimum
+        rows, _ = self._cached('rows', spec, lambda: self.engine.materialize(spec),
+                               sizeof=lambda result: estimate_size(result[0]) if result[1] else 0)
+        return rows
+
+    def summary(self, spec):
+        def compute():
+            cells = self.cube.cells_for(spec)
+            return summarize(cells if cells is not None else rows_as_cells(self.rows(spec)))
+        return self._cached('summary', spec, compute)
+
+    def _row_counts(self, spec):
+        # One count_values pass over the filtered rows serves the histogram,
+        # frequency and churn widgets for the same spec
+        def compute():
+            rows = self.rows(spec)
+            columns = [col for col in ROW_COUNT_COLUMNS if col in rows.columns]
+            counts = count_values(rows, columns, crosstabs=[CHURN_CROSSTAB])
+            # The churn curve is kept with the counts so threshold changes never recount
+            counts[CHURN_CROSSTAB] = churn_curve(counts[CHURN_CROSSTAB])
+            return counts
+        return self._cached('counts', spec, compute)
+
+    def value_counts(self, column, spec):
+        counts = self._row_counts(spec).get(column)
+        if counts is None:
+            counts = count_values(self.rows(spec), [column])[column]
+        return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+    def churn_curve(self, spec):
+        return self._row_counts(spec)[CHURN_CROSSTAB]
+
+    def churn_counts(self, spec, threshold):
+        return churn_at(self.churn_curve(spec), threshold)
+
+    def monthly_customer_type_counts(self):
+        def compute():
+            months = self.df['purchase_date'].dt.to_period('M').rename('purchase_month')
+            return self.df.groupby([months, 'is_returning_customer']).size().unstack(fill_value=0)
+        return self._cached('cohort', None, compute)
+
+    def _order(self, search, sort_by, ascending):
+        return self._cached('order', (search, sort_by, ascending),
+                            lambda: raw_data_order(self.df, search, sort_by, ascending))
+
+    def page(self, search, sort_by, ascending, page, page_size):
+        positions = self._order(search, sort_by, ascending)
+        return page_rows(self.df, positions, page, page_size), len(positions)
+
+    def export(self, fmt, output, search=None, sort_by=None, ascending=True):
+        return export_data(self.df, fmt, output, positions=self._order(search, sort_by, ascending))
+
+
+class LiveBackend:
+    # The PandasBackend of a TailIngestor's latest version, scoped
+    # (namespace, version) in `cache`. A refresh that only appended rows
+    # extends the previous backend (see PandasBackend.append); a rebuild, or
+    # a version this object did not see, builds a new one. Entries of older
+    # versions are dropped from the cache when the version changes.
+
+    def __init__(self, ingestor, cache=None, namespace=DATA_PATH):
+        self.ingestor = ingestor
+        self.cache = cache if cache is not None else SharedCache()
+        self.namespace = namespace
+        self.backend = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            self.ingestor.refresh()
+            (version, frame), tail = self.ingestor.snapshot(), self.ingestor.tail
+            previous = self.backend
+            if previous is not None and previous.scope[1] == version:
+                return previous
+            scope = (self.namespace, version)
+            if previous is not None and tail is not None and tail[0] == previous.scope[1] \
+                    and len(previous.df) + len(tail[1]) == len(frame):
+                self.backend = previous.append(frame, tail[1], scope=scope)
+            else:
+                self.backend = PandasBackend(frame, cache=self.cache, scope=scope)
+            self.cache.invalidate(self.namespace, keep_version=version)
+            return self.backend
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _sql_value(value):
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return value.item() if hasattr(value, 'item') else value
+
+
+class SQLBackend:
+    # The normalized dataset in an embedded SQLite or DuckDB file. Dates are
+    # stored as ISO text and month/weekday are derived at ingest time, so every
+    # query is plain, dialect-neutral SQL with the filters in its WHERE clause.
+
+    def __init__(self, db_path, engine='sqlite'):
+        if engine not in ('sqlite', 'duckdb'):
+            raise ValueError(f"Unsupported SQL engine {engine!r}; expected 'sqlite' or 'duckdb'")
+        self.db_path = db_path
+        self.engine = engine
+        self.name = engine
+        self._local = threading.local()
+        # Shared by every session's script thread
+        self._curves = OrderedDict()
+        self._curves_lock = threading.Lock()
+        self._duckdb = None
+        if engine == 'duckdb':
+            import duckdb
+
+            self._duckdb = duckdb.connect(db_path)
+
+    def _conn(self):
+        # SQLite connections are per thread; DuckDB hands out per-thread cursors
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._duckdb.cursor() if self._duckdb is not None else sqlite3.connect(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql, params=()):
+        cursor = self._conn().execute(sql, list(params))
+        columns = [d[0] for d in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    @property
+    def columns(self):
+        if getattr(self, '_columns', None) is None:
+            self._columns = list(self._query(f"SELECT * FROM {TABLE} LIMIT 0").columns)
+        return self._columns
+
+    # Ingestion
+
+    def ingest_meta(self):
+        try:
+            meta = self._query("SELECT source, size, mtime_ns FROM ingest_meta")
+        except Exception:
+            return None
+        return None if meta.empty else tuple(meta.iloc[0])
+
+    def ingest(self, source=DATA_PATH, chunk_size=INGEST_CHUNK_SIZE):
+        # (Re)load `source` chunk by chunk; only one chunk is ever in memory
+        conn = self._conn()
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.execute("DROP TABLE IF EXISTS ingest_meta")
+        self._columns = None
+        created = False
+        for chunk in iter_csv_chunks(source, chunk_size):
+            chunk['purchase_date'] = chunk['purchase_date'].dt.strftime('%Y-%m-%d')
+            if not created:
+                conn.execute(f"CREATE TABLE {TABLE} ({', '.join(self._column_defs(chunk))})")
+                created = True
+            self._insert(chunk)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE}_date ON {TABLE} (purchase_date)")
+        size, mtime_ns = source_version(source)
+        conn.execute("CREATE TABLE ingest_meta (source TEXT, size BIGINT, mtime_ns BIGINT)")
+        conn.execute("INSERT INTO ingest_meta VALUES (?, ?, ?)", [os.path.abspath(source), size, mtime_ns])
+        conn.commit()
+        return self
+
+    def _column_defs(self, chunk):
+        defs = []
+        for column in chunk.columns:
+            dtype = chunk[column].dtype
+            if pd.api.types.is_integer_dtype(dtype) and chunk[column].notna().all():
+                sql_type = 'BIGINT'
+            elif pd.api.types.is_numeric_dtype(dtype):
+                sql_type = 'DOUBLE'
+            else:
+                sql_type = 'TEXT'
+            defs.append(f"{_quote(column)} {sql_type}")
+        return defs
+
+    def _insert(self, chunk):
+        conn = self._conn()
+        if self.engine == 'duckdb':
+            conn.register('ingest_chunk', chunk)
+            conn.execute(f"INSERT INTO {TABLE} SELECT * FROM ingest_chunk")
+            conn.unregister('ingest_chunk')
+        else:
+            rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+            placeholders = ', '.join('?' * len(chunk.columns))
+            conn.executemany(f"INSERT INTO {TABLE} VALUES ({placeholders})", rows)
+
+    # Queries
+
+    def _where(self, spec, extra=()):
+        clauses, params = [], []
+        if spec is not None:
+            for column, values in spec.selections():
+                if column not in self.columns:
+                    continue
+                values = [_sql_value(v) for v in values]
+                if not values:
+                    clauses.append("1 = 0")
+                    continue
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+                params += values
+            for column, (low, high) in spec.ranges():
+                if column not in self.columns:
+                    continue
+                clauses.append(f"{_quote(column)} BETWEEN ? AND ?")
+                params += [_sql_value(low), _sql_value(high)]
+        for clause, values in extra:
+            clauses.append(clause)
+            params += values
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def options(self):
+        bounds = self._query(
+            f"SELECT MIN(purchase_date) AS min_date, MAX(purchase_date) AS max_date, MIN(age) AS min_age, "
+            f"MAX(age) AS max_age, MAX(previous_purchases) AS max_pp FROM {TABLE}"
+        ).iloc[0]
+        options = {
+            'columns': self.columns,
+            'date_bounds': (pd.Timestamp(bounds['min_date']), pd.Timestamp(bounds['max_date'])),
+            'age_bounds': (int(bounds['min_age']), int(bounds['max_age'])) if 'age' in self.columns else None,
+            'price_bounds': None,
+            'max_previous_purchases': int(bounds['max_pp']),
+        }
+        if 'price' in self.columns:
+            price = self._query(f"SELECT MIN(price) AS lo, MAX(price) AS hi FROM {TABLE}").iloc[0]
+            options['price_bounds'] = (float(price['lo']), float(price['hi']))
+        for column in OPTION_COLUMNS:
+            if column in self.columns:
+                values = self._query(f"SELECT DISTINCT {_quote(column)} AS v FROM {TABLE} WHERE {_quote(column)} IS NOT NULL")
+                options[column] = sorted(values['v'].tolist())
+            else:
+                options[column] = []
+        return options
+
+    def _restore_types(self, frame, optimize=True):
+        frame['purchase_date'] = pd.to_datetime(frame['purchase_date'], errors='coerce')
+        return optimize_dtypes(frame) if optimize else frame
+
+    def rows(self, spec=None):
+        where, params = self._where(spec)
+        return self._restore_types(self._query(f"SELECT * FROM {TABLE}{where} ORDER BY purchase_date", params))
+
+    def summary(self, spec):
+        measures = ("COUNT(*) AS count, SUM(previous_purchases) AS previous_purchases_sum, "
+                    "COUNT(previous_purchases) AS previous_purchases_count")
+        if 'price' in self.columns:
+            measures += ", SUM(price) AS price_sum"
+        where, params = self._where(spec)
+        cells = self._query(
+            f"SELECT purchase_date, payment_method, is_returning_customer, {measures} "
+            f"FROM {TABLE}{where} GROUP BY purchase_date, payment_method, is_returning_customer", params
+        )
+        cells['purchase_date'] = pd.to_datetime(cells['purchase_date'])
+        return summarize(cells)
+
+    def value_counts(self, column, spec):
+        where, params = self._where(spec, [(f"{_quote(column)} IS NOT NULL", [])])
+        counts = self._query(
+            f"SELECT {_quote(column)} AS value, COUNT(*) AS count FROM {TABLE}{where} "
+            f"GROUP BY {_quote(column)} ORDER BY count DESC", params
+        )
+        return pd.Series(counts['count'].to_numpy(), index=pd.Index(counts['value'], name=column), name='count')
+
+    def churn_curve(self, spec):
+        # One GROUP BY per spec; every threshold after that is a lookup
+        with self._curves_lock:
+            if spec in self._curves:
+                self._curves.move_to_end(spec)
+                return self._curves[spec]
+        where, params = self._where(spec, [("previous_purchases IS NOT NULL", [])])
+        counts = self._query(
+            f"SELECT previous_purchases, is_returning_customer, COUNT(*) AS count FROM {TABLE}{where} "
+            f"GROUP BY previous_purchases, is_returning_customer", params
+        )
+        grid = counts.pivot_table(index='previous_purchases', columns='is_returning_customer',
+                                  values='count', aggfunc='sum', fill_value=0)
+        if len(grid):
+            grid = grid.reindex(pd.RangeIndex(int(grid.index.min()), int(grid.index.max()) + 1), fill_value=0)
+        curve = churn_curve(grid)
+        with self._curves_lock:
+            self._curves[spec] = curve
+            if len(self._curves) > 8:
+                self._curves.popitem(last=False)
+        return curve
+
+    def churn_counts(self, spec, threshold):
+        return churn_at(self.churn_curve(spec), threshold)
+
+    def monthly_customer_type_counts(self):
+        counts = self._query(
+            f"SELECT substr(purchase_date, 1, 7) AS purchase_month, is_returning_customer, COUNT(*) AS count "
+            f"FROM {TABLE} WHERE purchase_date IS NOT NULL GROUP BY 1, 2"
+        )
+        counts['purchase_month'] = pd.PeriodIndex(counts['purchase_month'], freq='M')
+        return counts.pivot_table(index='purchase_month', columns='is_returning_customer',
+                                  values='count', aggfunc='sum', fill_value=0)
+
+    def _search_query(self, search, sort_by, ascending):
+        extra = []
+        if search:
+            text_columns = [c for c in self._text_columns() if c != 'purchase_date']
+            pattern = '%' + search.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            clause = " OR ".join(f"LOWER({_quote(c)}) LIKE ? ESCAPE '\\'" for c in text_columns)
+            extra.append((f"({clause})", [pattern] * len(text_columns)))
+        where, params = self._where(None, extra)
+        order = "purchase_date"
+        if sort_by:
+            order = f"{_quote(sort_by)} {'ASC' if ascending else 'DESC'} NULLS LAST, purchase_date"
+        return where, params, order
+
+    def _text_columns(self):
+        # From the declared column types (see _column_defs), not from sample
+        # values, where a NULL says nothing about the column
+        if self.engine == 'duckdb':
+            types = self._query("SELECT column_name AS name, data_type AS type FROM information_schema.columns "
+                                "WHERE table_name = ? ORDER BY ordinal_position", [TABLE])
+        else:
+            types = self._query(f"PRAGMA table_info({TABLE})")
+        return [name for name, sql_type in zip(types['name'], types['type']) if sql_type.upper() in ('TEXT', 'VARCHAR')]
+
+    def page(self, search, sort_by, ascending, page, page_size):
+        where, params, order = self._search_query(search, sort_by, ascending)
+        total = int(self._query(f"SELECT COUNT(*) AS n FROM {TABLE}{where}", params)['n'].iloc[0])
+        rows = self._query(
+            f"SELECT * FROM {TABLE}{where} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [page_size, (page - 1) * page_size],
+        )
+        return self._restore_types(rows), total
+
+    def export(self, fmt, output, search=None, sort_by=None, ascending=True, chunk_size=EXPORT_CHUNK_SIZE):
+        where, params, order = self._search_query(search, sort_by, ascending)
+        cursor = self._conn().execute(f"SELECT * FROM {TABLE}{where} ORDER BY {order}", params)
+        columns = [d[0] for d in cursor.description]
+
+        def frames():
+            while True:
+                batch = cursor.fetchmany(chunk_size)
+                if not batch:
+                    return
+                yield self._restore_types(pd.DataFrame(batch, columns=columns), optimize=False)
+
+        chunks = frames()
+        first = next(chunks, None)
+        template = (first if first is not None else pd.DataFrame(columns=columns)).iloc[:0]
+        head = [] if first is None else [first]
+        return export_frames(template, (chunk for part in (head, chunks) for chunk in part), fmt, output)
+
+
+def churn_curve(grid):
+    # Cumulative churned counts per customer type, indexed by threshold: row t
+    # counts the transactions with at most t previous purchases. `grid` is a
+    # previous_purchases x is_returning_customer count table.
+    curve = grid.reindex(columns=[0, 1], fill_value=0).cumsum().astype('int64')
+    curve.index = pd.Index(curve.index, name='threshold')
+    curve.columns = pd.Index([CUSTOMER_TYPE_LABELS[c] for c in curve.columns], name='customer_type')
+    return curve
+
+
+def churn_at(curve, threshold):
+    # Churned New/Returning counts for `threshold`, looked up on the curve
+    position = curve.index.searchsorted(threshold, side='right') - 1
+    if position < 0:
+        return pd.Series(0, index=curve.columns, name='count')
+    return curve.iloc[position].rename('count')
+
+
+def open_backend(kind=BACKEND, source=DATA_PATH, db_path=DB_PATH):
+    # The configured backend for `source`; SQL backends re-ingest only when
+    # the source file's size or mtime changed since the last ingest
+    if kind == 'pandas':
+        return PandasBackend(load_data(source))
+    if os.path.isdir(source):
+        raise ValueError(f"The {kind} backend ingests a single CSV; {source!r} is a partition directory")
+    if db_path is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(source)), CACHE_DIR)
+        os.makedirs(cache_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(source))[0]
+        db_path = os.path.join(cache_dir, f"{stem}.{kind}.db")
+    backend = SQLBackend(db_path, engine=kind)
+    if backend.ingest_meta() != (os.path.abspath(source), *source_version(source)):
+        backend.ingest(source)
+    return backend
@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from utils import CACHE_DIR, DATA_PATH, compute_cohort_table, compute_monthly_revenue, load_data, to_excel
+from filters import FilterEngine, FilterSpec
+from ml_models import MLModels, cluster_customers
+
+BENCH_DIR = os.path.join(CACHE_DIR, "bench")
+BASELINE_PATH = "benchmarks.json"
+DEFAULT_ROWS = [10_000, 100_000]
+GENERATE_CHUNK_SIZE = 1_000_000
+# ~3 purchases per customer, so cohorts have repeat activity
+CUSTOMERS_PER_ROW = 0.3
+# Excel sheets stop at 1,048,576 rows, so to_excel is timed on a capped head
+EXCEL_ROW_CAP = 100_000
+# Slower than baseline by more than TOLERANCE (and by at least MIN_SECONDS, to
+# ignore timer noise on fast steps) counts as a regression; likewise for memory
+TOLERANCE = 0.25
+MIN_SECONDS = 0.05
+MEMORY_TOLERANCE = 0.25
+
+
+def generate_transactions(n_rows, seed=0, source=DATA_PATH, n_customers=None):
+    # Synthetic rows with the source CSV's columns and per-column value
+    # distributions (each column is resampled from the source's values).
+    # Customer ids repeat so cohorts have returning customers, customer_type
+    # and is_returning_customer stay consistent, and a `price` column mirrors
+    # the purchase amount so the revenue paths have work to do.
+    template = pd.read_csv(source)
+    rng = np.random.default_rng(seed)
+    frame = {}
+    for column in template.columns:
+        values = template[column].to_numpy()
+        frame[column] = values[rng.integers(0, len(values), n_rows)]
+    n_customers = n_customers or max(1, int(n_rows * CUSTOMERS_PER_ROW))
+    frame['customer_id'] = rng.integers(1, n_customers + 1, n_rows)
+    if 'customer_type' in template.columns:
+        returning = rng.random(n_rows) < (template['customer_type'] == 'returning').mean()
+        frame['customer_type'] = np.where(returning, 'returning', 'new')
+        if 'is_returning_customer' in template.columns:
+            frame['is_returning_customer'] = returning.astype(int)
+    df = pd.DataFrame(frame, columns=list(template.columns))
+    if 'purchase_amount_(usd)' in df.columns:
+        df['price'] = df['purchase_amount_(usd)'].astype('float64')
+    return df
+
+
+def write_transactions(path, n_rows, seed=0, chunk_size=GENERATE_CHUNK_SIZE):
+    # Generate straight to CSV in chunks, so 10M+ rows never sit in memory at once
+    # Every chunk draws ids from the full customer range, so customers span chunks
+    n_customers = max(1, int(n_rows * CUSTOMERS_PER_ROW))
+    with open(path, 'w', newline='') as f:
+        for i, start in enumerate(range(0, n_rows, chunk_size)):
+            chunk = generate_transactions(min(chunk_size, n_rows - start), seed=seed + i, n_customers=n_customers)
+            chunk.to_csv(f, index=False, header=(i == 0))
+    return path
+
+
+def dataset_path(n_rows, data_dir=BENCH_DIR, seed=0):
+    # Generated datasets are kept between runs; generating 10M rows is slow
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"transactions_{n_rows}_{seed}.csv")
+    if not os.path.exists(path):
+        write_transactions(f"{path}.tmp", n_rows, seed=seed)
+        os.replace(f"{path}.tmp", path)
+    return path
+
+
+def sidebar_spec(df):
+    # A typical sidebar selection: a few months, two genders, most payment methods
+    start = df['purchase_date'].min() + pd.Timedelta(days=60)
+    return FilterSpec.from_selection(
+        start_date=start, end_date=start + pd.Timedelta(days=120), age_range=(25, 55),
+        payment_methods=sorted(df['payment_method'].dropna().unique())[:-1],
+        genders=df['gender'].dropna().unique(), customer_types=['New', 'Returning'],
+    )
+
+
+def _fitted_churn_model(df):
+    models = MLModels()
+    models.train_churn_model(df)
+    return models
+
+
+# name -> (setup(path, df) -> state, run(state)); only run() is measured
+BENCHMARKS = {
+    'load_data': (lambda path, df: path, lambda path: load_data(path, use_cache=False)),
+    'filter_engine_build': (lambda path, df: df, FilterEngine),
+    'filter_chain': (lambda path, df: (FilterEngine(df, cache_size=0), sidebar_spec(df)),
+                     lambda state: state[0].filter(state[1])),
+    'compute_cohort_table': (lambda path, df: df, compute_cohort_table),
+    'compute_monthly_revenue': (lambda path, df: df, compute_monthly_revenue),
+    'to_excel': (lambda path, df: df.head(EXCEL_ROW_CAP), to_excel),
+    'predict_churn': (lambda path, df: (_fitted_churn_model(df), df), lambda state: state[0].predict_churn(state[1])),
+    'cluster_customers': (lambda path, df: df, cluster_customers),
+}
+
+
+def measure(func, state, repeat=1):
+    # Best wall time over `repeat` untraced runs, then one more run under
+    # tracemalloc for the peak allocation (tracing slows the code it watches).
+    # numpy and pandas buffers are traced; pyarrow's memory pool is not.
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(state)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': round(min(timings), 4), 'peak_mb': round(peak / 2 ** 20, 2)}
+
+
+def run_benchmarks(rows=DEFAULT_ROWS, names=None, repeat=1, data_dir=BENCH_DIR, log=print):
+    results = {}
+    for n_rows in rows:
+        path = dataset_path(n_rows, data_dir)
+        df = load_data(path)
+        results[str(n_rows)] = {}
+        for name in names or BENCHMARKS:
+            setup, run = BENCHMARKS[name]
+            result = measure(run, setup(path, df), repeat)
+            results[str(n_rows)][name] = result
+            if log:
+                log(f"{n_rows:>12,} {name:<26} {result['seconds']:>9.3f}s {result['peak_mb']:>10.1f} MB")
+    return {
+        'meta': {
+            'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'machine': platform.machine(), 'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def check_regressions(current, baseline, tolerance=TOLERANCE, min_seconds=MIN_SECONDS,
+                      memory_tolerance=MEMORY_TOLERANCE):
+    # Human-readable regressions of `current` against `baseline`; steps or
+    # sizes missing from either side are not compared
+    regressions = []
+    for n_rows, steps in current['results'].items():
+        for name, result in steps.items():
+            base = baseline.get('results', {}).get(n_rows, {}).get(name)
+            if base is None:
+                continue
+            slower = result['seconds'] - base['seconds']
+            if slower > min_seconds and result['seconds'] > base['seconds'] * (1 + tolerance):
+                regressions.append(f"{name} @ {n_rows} rows: {base['seconds']:.3f}s -> {result['seconds']:.3f}s")
+            if result['peak_mb'] > max(base['peak_mb'] * (1 + memory_tolerance), base['peak_mb'] + 1):
+                regressions.append(f"{name} @ {n_rows} rows: {base['peak_mb']:.1f} MB -> {result['peak_mb']:.1f} MB peak")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the dashboard's hot paths on synthetic data.")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="dataset sizes to run")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=1, help="runs per benchmark; the best time is kept")
+    parser.add_argument('--data-dir', default=BENCH_DIR, help="where generated datasets are kept")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument('--output', help="write this run's results to a JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="overwrite the baseline with this run")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.rows, args.only, args.repeat, args.data_dir)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = check_regressions(current, baseline, tolerance=args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("No regressions against the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+MAX_CACHED_CHARTS = 64
+RENDER_WORKERS = 4
+
+# Rendered chart bytes keyed on (chart, format, hash of the aggregates drawn).
+# Entries are futures so a chart that is still rendering is shared, not redrawn.
+_cache = OrderedDict()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="chart-render")
+
+
+def aggregate_key(*aggregates):
+    digest = hashlib.sha1()
+    for agg in aggregates:
+        if isinstance(agg, (pd.Series, pd.DataFrame)):
+            digest.update(pd.util.hash_pandas_object(agg, index=True).to_numpy().tobytes())
+            digest.update(repr(getattr(agg, 'name', None)).encode())
+        else:
+            digest.update(repr(agg).encode())
+    return digest.hexdigest()
+
+
+def _render(chart, aggregates, fmt):
+    # Charts draw on a bare matplotlib Figure rather than pyplot, so nothing is
+    # registered in pyplot's global figure manager and renders can run on
+    # worker threads; the figure is cleared as soon as its bytes are saved.
+    fig = chart(*aggregates)
+    try:
+        buf = BytesIO()
+        fig.savefig(buf, format=fmt, bbox_inches='tight')
+        return buf.getvalue()
+    finally:
+        fig.clear()
+
+
+def _forget(key, future):
+    if future.exception() is not None:
+        with _lock:
+            if _cache.get(key) is future:
+                del _cache[key]
+
+
+def submit(chart, *aggregates, fmt='png'):
+    # Schedule `chart(*aggregates)` on the render pool, or return the cached render
+    key = (chart.__name__, fmt, aggregate_key(*aggregates))
+    with _lock:
+        future = _cache.get(key)
+        if future is not None:
+            _cache.move_to_end(key)
+            return future
+        future = _executor.submit(_render, chart, aggregates, fmt)
+        _cache[key] = future
+        while len(_cache) > MAX_CACHED_CHARTS:
+            _cache.popitem(last=False)
+    future.add_done_callback(lambda f: _forget(key, f))
+    return future
+
+
+def render(chart, *aggregates, fmt='png'):
+    return submit(chart, *aggregates, fmt=fmt).result()
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def payment_preferences(payment_counts):
+    fig = Figure(figsize=(12, 5))
+    ax = fig.subplots(1, 2)
+
+    # Count plot
+    sns.barplot(x=payment_counts.values, y=payment_counts.index.astype(str), order=payment_counts.index.astype(str),
+                hue=payment_counts.index.astype(str), palette="Set2", legend=False, orient='h', ax=ax[0])
+    ax[0].set_title("Payment Method Usage (Count Plot)")
+    ax[0].set_xlabel("Count")
+    ax[0].set_ylabel("Payment Method")
+
+    # Pie chart
+    colors = sns.color_palette('Set2')[0:len(payment_counts)]
+    ax[1].pie(payment_counts.values, labels=payment_counts.index, colors=colors, autopct='%1.1f%%', startangle=140)
+    ax[1].set_title("Payment Method Usage (Pie Chart)")
+    return fig
+
+
+def customer_segmentation(segment_counts):
+    fig = Figure(figsize=(12, 5))
+    ax = fig.subplots(1, 2)
+
+    sns.barplot(x=segment_counts.index, y=segment_counts.values, hue=segment_counts.index, palette='pastel', legend=True, ax=ax[0])
+    ax[0].set_title("Customer Segmentation: New vs Returning (Bar Plot)")
+    ax[0].set_ylabel("Number of Customers")
+    ax[0].legend(title='Customer Type')
+
+    colors = sns.color_palette('pastel')[0:2]
+    ax[1].pie(segment_counts.values, labels=segment_counts.index, colors=colors, autopct='%1.1f%%', startangle=140)
+    ax[1].set_title("Customer Segmentation: New vs Returning (Pie Chart)")
+    return fig
+
+
+def churn_distribution(churn_values):
+    fig = Figure(figsize=(2, 2))  # Adjust figure size to be smaller and square
+    ax = fig.subplots()
+    colors = sns.color_palette('pastel')[0:2]
+    ax.pie(churn_values, labels=['New', 'Returning'], colors=colors, autopct='%1.1f%%', startangle=140)
+    ax.set_title("Churn Distribution: New vs Returning")
+    return fig
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils import CACHE_DIR, DATA_PATH, compute_monthly_revenue, source_version
+from filters import FilterSpec
+from backends import ROW_COUNT_COLUMNS, churn_at, open_backend
+
+# Dashboard metrics without Streamlit: compute_metrics() gives everything the
+# dashboard shows for one filter spec, and the CLI below precomputes it for a
+# list of presets into snapshot files the dashboard reads instead of recomputing.
+SNAPSHOT_DIR = os.environ.get("DASHBOARD_SNAPSHOT_DIR", os.path.join(CACHE_DIR, "snapshots"))
+# Bump whenever the snapshot payload layout changes; older files are ignored
+SNAPSHOT_VERSION = 2
+MAX_CACHED_SNAPSHOTS = 32
+CUSTOMER_TYPES = ['New', 'Returning']
+
+_snapshots = OrderedDict()
+_lock = threading.Lock()
+
+
+def default_selection(options):
+    # The sidebar's initial state as FilterSpec.from_selection arguments, so the
+    # default preset has the same fingerprint as an untouched dashboard
+    return {
+        'start_date': options['date_bounds'][0],
+        'end_date': options['date_bounds'][1],
+        'age_range': options['age_bounds'] or (None, None),
+        'price_range': options['price_bounds'] or (None, None),
+        'payment_methods': options['payment_method'],
+        'genders': options['gender'] or None,
+        'categories': options['category'] or None,
+        'customer_types': CUSTOMER_TYPES,
+    }
+
+
+def preset_spec(options, filters=None):
+    # A preset is the default selection with some filters overridden
+    return FilterSpec.from_selection(**{**default_selection(options), **(filters or {})})
+
+
+def default_presets(options):
+    # The untouched dashboard, each customer type, and each payment method
+    presets = {'default': {}}
+    for customer_type in CUSTOMER_TYPES:
+        presets[customer_type.lower()] = {'customer_types': [customer_type]}
+    for method in options['payment_method']:
+        presets[f"payment_{method.lower().replace(' ', '_')}"] = {'payment_methods': [method]}
+    return presets
+
+
+def compute_metrics(backend, spec):
+    # KPIs, chart distributions, the payment crosstab, the churn curve, cohort
+    # counts and monthly revenue for `spec`, as small pandas objects
+    rows = None
+    value_counts = {column: backend.value_counts(column, spec) for column in ROW_COUNT_COLUMNS}
+    if 'price' in backend.options()['columns']:
+        rows = backend.rows(spec)
+    return {
+        'summary': backend.summary(spec),
+        'churn_curve': backend.churn_curve(spec),
+        'value_counts': value_counts,
+        'cohort_counts': backend.monthly_customer_type_counts(),
+        'monthly_revenue': compute_monthly_revenue(rows) if rows is not None else pd.DataFrame(),
+    }
+
+
+def churn_kpis(churn_curve, threshold, total_transactions):
+    # Churned New/Returning counts at `threshold` and the rates the Churn Summary tab shows
+    churned = churn_at(churn_curve, threshold)
+    total_churned = int(churned.sum())
+    return {
+        'churned': churned,
+        'total_churned': total_churned,
+        'churn_rate': total_churned / total_transactions * 100 if total_transactions > 0 else 0,
+        'returning_share': churned.get('Returning', 0) / total_churned * 100 if total_churned > 0 else 0,
+        'new_share': churned.get('New', 0) / total_churned * 100 if total_churned > 0 else 0,
+    }
+
+
+def dataset_key(path=DATA_PATH):
+    # Changes whenever the source file does, so snapshots of old data are never read
+    size, mtime_ns = source_version(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}|{size}|{mtime_ns}".encode()).hexdigest()[:16]
+
+
+def snapshot_path(data_key, spec, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, data_key, f"{spec.fingerprint()}.pkl")
+
+
+def write_snapshot(path, metrics, meta=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pd.to_pickle({'version': SNAPSHOT_VERSION, 'meta': meta or {}, 'metrics': metrics}, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_snapshot(data_key, spec, snapshot_dir=SNAPSHOT_DIR):
+    # The precomputed metrics for `spec`, or None. Parsed snapshots are kept
+    # in memory keyed on the file's mtime, so rewritten files are picked up.
+    path = snapshot_path(data_key, spec, snapshot_dir)
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+    with _lock:
+        if key in _snapshots:
+            _snapshots.move_to_end(key)
+            return _snapshots[key]
+    try:
+        payload = pd.read_pickle(path)
+    except Exception:
+        return None
+    metrics = payload['metrics'] if payload.get('version') == SNAPSHOT_VERSION else None
+    with _lock:
+        _snapshots[key] = metrics
+        if len(_snapshots) > MAX_CACHED_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return metrics
+
+
+_worker_backend = None
+
+
+def _init_metrics_worker(kind, source):
+    global _worker_backend
+    _worker_backend = open_backend(kind, source)
+
+
+def _compute_in_worker(name, filters, data_key, snapshot_dir):
+    start = time.perf_counter()
+    spec = preset_spec(_worker_backend.options(), filters)
+    metrics = compute_metrics(_worker_backend, spec)
+    meta = {'preset': name, 'filters': spec.to_dict(), 'computed_at': time.time()}
+    path = write_snapshot(snapshot_path(data_key, spec, snapshot_dir), metrics, meta)
+    return name, path, time.perf_counter() - start
+
+
+def precompute(source=DATA_PATH, presets=None, snapshot_dir=SNAPSHOT_DIR, workers=None, kind='pandas'):
+    # Snapshot every preset ({name: filter overrides}) of `source`, spread over
+    # `workers` processes that each load the data once; returns {name: path}
+    if os.path.isdir(source):
+        raise ValueError(f"Snapshots are keyed on a single source file; {source!r} is a partition directory")
+    # Load once up front: fills the Parquet cache (or SQL database) the workers read
+    backend = open_backend(kind, source)
+    if presets is None:
+        presets = default_presets(backend.options())
+    data_key = dataset_key(source)
+    workers = min(workers or os.cpu_count() or 1, len(presets))
+    if workers <= 1:
+        global _worker_backend
+        _worker_backend = backend
+        results = [_compute_in_worker(name, filters, data_key, snapshot_dir) for name, filters in presets.items()]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_metrics_worker,
+                                 initargs=(kind, source)) as pool:
+            futures = [pool.submit(_compute_in_worker, name, filters, data_key, snapshot_dir)
+                       for name, filters in presets.items()]
+            results = [future.result() for future in futures]
+    return {name: (path, seconds) for name, path, seconds in results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute dashboard metrics for filter presets.")
+    parser.add_argument('--data', default=DATA_PATH, help="source CSV")
+    parser.add_argument('--presets', help="JSON file of {name: {filter: value}} overrides of the default "
+                                          "selection (default: the untouched dashboard, each customer type "
+                                          "and each payment method)")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help="where snapshot files are written")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument('--backend', default='pandas', choices=['pandas', 'sqlite', 'duckdb'])
+    args = parser.parse_args(argv)
+
+    presets = None
+    if args.presets:
+        with open(args.presets) as f:
+            presets = json.load(f)
+    start = time.perf_counter()
+    results = precompute(args.data, presets, args.snapshot_dir, args.workers, args.backend)
+    for name, (path, seconds) in results.items():
+        print(f"{name:<32} {seconds:>8.3f}s  {path}")
+    print(f"{len(results)} snapshots in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import copy
+from calendar import month_name
+from dataclasses import replace
+
+import pandas as pd
+
+from filters import FilterEngine
+from utils import WEEKDAYS, count_values
+
+# Cube dimensions. The day-level purchase_date subsumes month and weekday, so
+# any date range is answered exactly; age is stored as its bucket's lower edge.
+CUBE_DIMENSIONS = ['purchase_date', 'payment_method', 'category', 'gender', 'is_returning_customer', 'age']
+AGE_BUCKET_WIDTH = 5
+CUSTOMER_TYPE_LABELS = {0: 'New', 1: 'Returning'}
+
+
+def rows_as_cells(df):
+    # Raw rows in the cube's cell layout (one cell per row), so the same
+    # summarize() serves both the cube and the raw fallback
+    cells = pd.DataFrame({col: df[col] for col in CUBE_DIMENSIONS if col in df.columns})
+    cells['count'] = 1
+    # Rows without previous purchases add to neither the sum nor the count,
+    # so the average skips them like Series.mean()
+    cells['previous_purchases_sum'] = df['previous_purchases'].fillna(0).astype('int64')
+    cells['previous_purchases_count'] = df['previous_purchases'].notna().astype('int64')
+    if 'price' in df.columns:
+        cells['price_sum'] = df['price'].astype('float64')
+    return cells
+
+
+class TransactionCube:
+    # Counts, previous-purchase sums and price sums pre-aggregated at load time
+    # over every observed dimension combination. Specs whose filters align with
+    # the cube's grain are answered from these cells; anything finer (a price
+    # range, or an age range that splits a bucket) returns None so the caller
+    # falls back to the raw rows.
+
+    def __init__(self, df, age_bucket_width=AGE_BUCKET_WIDTH):
+        self.age_bucket_width = age_bucket_width
+        self.has_price = 'price' in df.columns
+        self._set_bounds(df)
+        self.day_grain = _is_day_grain(df)
+        self.cells = _group_cells(self._bucketed_cells(df))
+        self._engine = FilterEngine(self.cells)
+
+    def append(self, df, tail):
+        # The cube of `df`, which is this cube's rows plus `tail`. Only the
+        # tail is grouped; its cells are merged into the existing ones, on
+        # df's dtypes so categorical dimensions share df's widened categories.
+        cube = copy.copy(self)
+        cube._set_bounds(df)
+        cube.day_grain = self.day_grain and _is_day_grain(tail)
+        dtypes = {col: df[col].dtype for col in CUBE_DIMENSIONS if col in self.cells.columns}
+        cells = [self.cells.astype(dtypes), self._bucketed_cells(tail).astype(dtypes)]
+        cube.cells = _group_cells(pd.concat(cells, ignore_index=True))
+        cube._engine = FilterEngine(cube.cells)
+        return cube
+
+    def _set_bounds(self, df):
+        self.age_bounds = (df['age'].min(), df['age'].max()) if 'age' in df.columns else None
+        self.price_bounds = (df['price'].min(), df['price'].max()) if self.has_price else None
+        self.price_has_nan = self.has_price and bool(df['price'].isna().any())
+
+    def _bucketed_cells(self, df):
+        cells = rows_as_cells(df)
+        if 'age' in cells.columns:
+            width = self.age_bucket_width
+            cells['age'] = (cells['age'] // width * width).astype(cells['age'].dtype)
+        return cells
+
+    def _bucket_range(self, age_range):
+        # Bucket-edge equivalent of an inclusive age range, or None if it splits a bucket
+        width = self.age_bucket_width
+        low, high = age_range
+        min_age, max_age = self.age_bounds
+        if low > min_age and low % width != 0:
+            return None
+        if high < max_age and (high + 1) % width != 0:
+            return None
+        low, high = max(low, min_age), min(high, max_age)
+        return (low // width * width, high // width * width)
+
+    def cells_for(self, spec):
+        if spec.price_range is not None and self.has_price:
+            low, high = spec.price_range
+            # A price range excludes rows without a price, which the cells
+            # cannot tell apart, even when it spans every price
+            if low > self.price_bounds[0] or high < self.price_bounds[1] or self.price_has_nan:
+                return None
+            spec = replace(spec, price_range=None)
+        if spec.date_range is not None and not self.day_grain:
+            return None
+        if spec.age_range is not None and self.age_bounds is not None:
+            age_range = self._bucket_range(spec.age_range)
+            if age_range is None:
+                return None
+            spec = replace(spec, age_range=age_range)
+        return self._engine.filter(spec)
+
+
+def _is_day_grain(df):
+    dates = df['purchase_date'].dropna()
+    return bool((dates == dates.dt.normalize()).all())
+
+
+def _group_cells(cells):
+    dims = [col for col in CUBE_DIMENSIONS if col in cells.columns]
+    measures = [col for col in ('count', 'previous_purchases_sum', 'previous_purchases_count', 'price_sum')
+                if col in cells.columns]
+    return cells.groupby(dims, observed=True, dropna=False)[measures].sum().reset_index()
+
+
+def summarize(cells):
+    # Dashboard aggregates from a cube slice or rows_as_cells(filtered_df).
+    # All distributions come from one count_values call weighted by `count`.
+    dates = cells['purchase_date']
+    counts = count_values(
+        {
+            'is_returning_customer': cells['is_returning_customer'],
+            'payment_method': cells['payment_method'],
+            'month': dates.dt.month,
+            'day_of_week': dates.dt.weekday,
+        },
+        crosstabs=[('payment_method', 'is_returning_customer')],
+        weights=cells['count'],
+    )
+    total = int(cells['count'].sum())
+    known = int(cells['previous_purchases_count'].sum())
+    by_type = counts['is_returning_customer']
+    by_type = by_type[by_type > 0]
+
+    payment_counts = counts['payment_method']
+    payment_counts = payment_counts[payment_counts > 0].sort_values(ascending=False, kind='stable')
+
+    cross_tab = counts[('payment_method', 'is_returning_customer')]
+    cross_tab = cross_tab.loc[cross_tab.sum(axis=1) > 0, cross_tab.sum() > 0]
+    cross_tab.columns = [CUSTOMER_TYPE_LABELS.get(c, c) for c in cross_tab.columns]
+
+    monthly = counts['month']
+    monthly = monthly[monthly > 0].rename('transaction_count')
+    monthly.index = pd.Index([month_name[int(m)] for m in monthly.index], name='month_name')
+    weekly = counts['day_of_week']
+    weekly = weekly.set_axis(pd.Index([WEEKDAYS[int(d)] for d in weekly.index], name='day_of_week'))
+    weekly = weekly.reindex(WEEKDAYS, fill_value=0)
+
+    return {
+        'total_transactions': total,
+        'customer_types_present': len(by_type),
+        'returning_percentage': by_type.get(1, 0) / total * 100 if total > 0 else 0,
+        'avg_previous_purchases': cells['previous_purchases_sum'].sum() / known if known > 0 else float('nan'),
+        'total_revenue': float(cells['price_sum'].sum()) if 'price_sum' in cells.columns else None,
+        'payment_counts': payment_counts,
+        'segment_counts': by_type.sort_values(ascending=False, kind='stable').rename(CUSTOMER_TYPE_LABELS),
+        'payment_by_customer_type': cross_tab,
+        'monthly_counts': monthly,
+        'weekday_counts': weekly,
+    }
@@ -0,0 +1,230 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+from utils import date_bounds, is_date_sorted
+
+CUSTOMER_TYPE_VALUES = {'new': 0, 'returning': 1}
+
+# FilterSpec field -> column it narrows
+CATEGORICAL_FILTERS = {
+    'payment_methods': 'payment_method',
+    'genders': 'gender',
+    'categories': 'category',
+    'customer_types': 'is_returning_customer',
+}
+RANGE_FILTERS = {
+    'date_range': 'purchase_date',
+    'age_range': 'age',
+    'price_range': 'price',
+}
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    # None means "no filter on this dimension"; ranges are inclusive (low, high)
+    date_range: tuple = None
+    age_range: tuple = None
+    price_range: tuple = None
+    payment_methods: frozenset = None
+    genders: frozenset = None
+    categories: frozenset = None
+    customer_types: frozenset = None
+
+    @classmethod
+    def from_selection(cls, start_date=None, end_date=None, age_range=None, price_range=None,
+                       payment_methods=None, genders=None, categories=None, customer_types=None):
+        def as_set(values):
+            return None if values is None else frozenset(values)
+
+        def as_range(bounds):
+            if bounds is None or None in bounds:
+                return None
+            return tuple(bounds)
+
+        date_range = None
+        if start_date is not None and end_date is not None:
+            date_range = (pd.Timestamp(start_date), pd.Timestamp(end_date))
+        return cls(
+            date_range=date_range,
+            age_range=as_range(age_range),
+            price_range=as_range(price_range),
+            payment_methods=as_set(payment_methods),
+            genders=as_set(genders),
+            categories=as_set(categories),
+            customer_types=as_set(customer_types),
+        )
+
+    def fingerprint(self):
+        # Stable across processes (unlike hash()), for on-disk and cross-run cache keys
+        parts = []
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if isinstance(value, frozenset):
+                value = sorted(map(str, value))
+            parts.append(f"{field.name}={value!s}")
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+    def to_dict(self):
+        # Plain JSON values, for tagging profiles and snapshots with the filters
+        values = {}
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if isinstance(value, frozenset):
+                value = sorted(map(str, value))
+            elif isinstance(value, tuple):
+                value = [str(v) for v in value]
+            values[field.name] = value
+        return values
+
+    def selections(self):
+        for field, column in CATEGORICAL_FILTERS.items():
+            values = getattr(self, field)
+            if values is None:
+                continue
+            if field == 'customer_types':
+                values = {CUSTOMER_TYPE_VALUES[v.lower()] for v in values}
+            yield column, values
+
+    def ranges(self):
+        for field, column in RANGE_FILTERS.items():
+            bounds = getattr(self, field)
+            if bounds is not None:
+                yield column, bounds
+
+
+class FilterEngine:
+    # Row selection over a fixed frame. Categorical columns get one packed
+    # bitmap per value, range columns a sorted permutation, so a spec is
+    # answered with bitwise ops and binary searches instead of a chain of
+    # boolean masks that each copy the frame. On a date-sorted frame (see
+    # utils.sort_by_date) the date range is a binary-searched row interval and
+    # every other filter only touches the bytes of that interval.
+
+    def __init__(self, df, cache_size=16):
+        self.df = df
+        self._n = len(df)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._bitmaps = {}
+        self._sorted = {}
+        self.date_sorted = is_date_sorted(df)
+
+        for column in CATEGORICAL_FILTERS.values():
+            if column in df.columns:
+                self._bitmaps[column] = self._build_bitmaps(df[column])
+        for column in RANGE_FILTERS.values():
+            if column in df.columns and not (column == 'purchase_date' and self.date_sorted):
+                self._sorted[column] = self._build_sorted(df[column])
+
+    def _build_bitmaps(self, series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        bitmaps = {value: np.packbits(codes == code) for code, value in enumerate(uniques)}
+        return bitmaps, bool((codes < 0).any())
+
+    def _build_sorted(self, series):
+        values = series.to_numpy()
+        valid = np.flatnonzero(pd.notna(values))
+        order = valid[np.argsort(values[valid], kind='stable')]
+        return order, values[order]
+
+    def _value_bitmap(self, column, values, b0, b1):
+        bitmaps, has_null = self._bitmaps[column]
+        if not has_null and set(bitmaps).issubset(values):
+            return None
+        selected = np.zeros(b1 - b0, dtype=np.uint8)
+        for value in values:
+            bitmap = bitmaps.get(value)
+            if bitmap is not None:
+                selected |= bitmap[b0:b1]
+        return selected
+
+    def _range_bitmap(self, column, bounds, b0, b1):
+        order, sorted_values = self._sorted[column]
+        low, high = (_as_key(b, sorted_values.dtype) for b in bounds)
+        lo = np.searchsorted(sorted_values, low, side='left')
+        hi = np.searchsorted(sorted_values, high, side='right')
+        if lo == 0 and hi == self._n:
+            return None
+        if (b1 - b0) * 8 < self._n // 4:
+            # Narrow window: comparing the window's values beats scattering
+            # every matching position of the whole column
+            values = self.df[column].to_numpy()[b0 * 8:b1 * 8]
+            return np.packbits((values >= low) & (values <= high), bitorder='big')[:b1 - b0]
+        mask = np.zeros(self._n, dtype=bool)
+        mask[order[lo:hi]] = True
+        return np.packbits(mask)[b0:b1]
+
+    def _window(self, spec):
+        if self.date_sorted and spec.date_range is not None:
+            return date_bounds(self.df['purchase_date'], *spec.date_range)
+        return 0, self._n
+
+    def _select(self, spec):
+        # (start, stop, positions): the date interval, plus the matching row
+        # positions inside it or None when every row of the interval matches
+        start, stop = self._window(spec)
+        if stop <= start:
+            return start, start, None
+        b0, b1 = start // 8, (stop + 7) // 8
+        bitmaps = [self._value_bitmap(col, vals, b0, b1) for col, vals in spec.selections() if col in self._bitmaps]
+        bitmaps += [self._range_bitmap(col, bounds, b0, b1) for col, bounds in spec.ranges() if col in self._sorted]
+        selected = None
+        for bitmap in bitmaps:
+            if bitmap is None:
+                continue
+            if selected is None:
+                selected = bitmap
+            else:
+                selected &= bitmap
+        if selected is None:
+            return start, stop, None
+        mask = np.unpackbits(selected, count=min(self._n, b1 * 8) - b0 * 8).view(bool)
+        mask = mask[start - b0 * 8:stop - b0 * 8]
+        return start, stop, start + np.flatnonzero(mask)
+
+    def select(self, spec):
+        # Row positions matching `spec`, or None when nothing is filtered out
+        start, stop, positions = self._select(spec)
+        if positions is not None:
+            return positions
+        if start == 0 and stop == self._n:
+            return None
+        return np.arange(start, stop)
+
+    def materialize(self, spec):
+        # (rows, copied): the matching rows, and whether they are a new copy
+        # rather than a view sharing the frame's memory
+        start, stop, positions = self._select(spec)
+        if positions is not None:
+            return self.df.take(positions), True
+        if start == 0 and stop == self._n:
+            return self.df, False
+        # Only the date range narrows the rows: a zero-copy slice
+        return self.df.iloc[start:stop], False
+
+    def filter(self, spec):
+        # The LRU is guarded because one engine can serve several session threads
+        with self._cache_lock:
+            if spec in self._cache:
+                self._cache.move_to_end(spec)
+                return self._cache[spec]
+        view = self.materialize(spec)[0]
+        if self._cache_size <= 0:
+            return view
+        with self._cache_lock:
+            self._cache[spec] = view
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return view
+
+
+def _as_key(value, dtype):
+    if dtype.kind == 'M':
+        return pd.Timestamp(value).to_datetime64().astype(dtype)
+    return value
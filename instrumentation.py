@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import uuid
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+from utils import CACHE_DIR
+
+# Spans of every rerun are appended to METRICS_DIR/spans.jsonl, and running
+# totals per span are rewritten to METRICS_DIR/dashboard.prom (Prometheus text
+# format, e.g. for node_exporter's textfile collector). DASHBOARD_METRICS=0
+# turns both files off; the sidebar panel still works.
+METRICS_ENABLED = os.environ.get("DASHBOARD_METRICS", "1") != "0"
+METRICS_DIR = os.environ.get("DASHBOARD_METRICS_DIR", os.path.join(CACHE_DIR, "metrics"))
+# tracemalloc slows allocation-heavy code noticeably, so memory deltas are opt-in
+TRACE_MEMORY = os.environ.get("DASHBOARD_TRACE_MEMORY", "0") == "1"
+
+# Process-wide {span: [calls, seconds, last seconds, last peak bytes]}
+_totals = {}
+_lock = threading.Lock()
+
+
+class Recorder:
+    # Timing spans for one rerun. With trace_memory, each span also records its
+    # net allocation and its peak above the starting point (tracemalloc is
+    # process-wide, so concurrent sessions show up in each other's numbers).
+    # Spans that finish after flush() (e.g. deferred download callbacks) are
+    # written out on their own.
+
+    def __init__(self, trace_memory=TRACE_MEMORY, session=None, metrics_dir=METRICS_DIR, enabled=METRICS_ENABLED):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.session = session
+        self.metrics_dir = metrics_dir
+        self.enabled = enabled
+        self.spans = []
+        self._written = 0
+        self._flushed = False
+        self._stack = []
+        self._started_tracing = False
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def span(self, name):
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            entry = [current, current]
+            self._stack.append(entry)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {'span': name, 'seconds': time.perf_counter() - start}
+            if tracing:
+                self._stack.pop()
+            # Another session's recorder may have stopped tracing meanwhile
+            if tracing and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(entry[1], peak)
+                # The parent's peak includes this span's, which reset_peak would lose
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+                tracemalloc.reset_peak()
+                record['memory_delta_mb'] = (current - entry[0]) / 2 ** 20
+                record['peak_mb'] = (peak - entry[0]) / 2 ** 20
+            self.spans.append(record)
+            if self._flushed:
+                self.flush()
+
+    def timed(self, name, func):
+        # `func` wrapped in a span, for callables run later (download buttons)
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def frame(self):
+        columns = ['span', 'seconds', 'memory_delta_mb', 'peak_mb']
+        df = pd.DataFrame(self.spans, columns=columns)
+        if not self.trace_memory:
+            df = df.drop(columns=['memory_delta_mb', 'peak_mb'])
+        return df.set_index('span')
+
+    def total_seconds(self):
+        return sum(record['seconds'] for record in self.spans)
+
+    def flush(self):
+        # Append the spans not yet written; stops tracing if this rerun started it
+        self._flushed = True
+        if self._started_tracing and not self._stack:
+            tracemalloc.stop()
+            self._started_tracing = False
+        pending = self.spans[self._written:]
+        self._written = len(self.spans)
+        if not pending:
+            return
+        _record_totals(pending)
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            write_jsonl(os.path.join(self.metrics_dir, 'spans.jsonl'), pending, run=self.run_id, session=self.session)
+            write_prometheus(os.path.join(self.metrics_dir, 'dashboard.prom'))
+        except OSError:
+            pass
+
+
+def _record_totals(records):
+    with _lock:
+        for record in records:
+            totals = _totals.setdefault(record['span'], [0, 0.0, 0.0, None])
+            totals[0] += 1
+            totals[1] += record['seconds']
+            totals[2] = record['seconds']
+            if 'peak_mb' in record:
+                totals[3] = record['peak_mb'] * 2 ** 20
+
+
+def span_totals():
+    # {span: (calls, total seconds)} since the process started
+    with _lock:
+        return {name: (totals[0], totals[1]) for name, totals in _totals.items()}
+
+
+def write_jsonl(path, records, **fields):
+    timestamp = time.time()
+    lines = [json.dumps({'ts': timestamp, **fields, **record}) for record in records]
+    with open(path, 'a') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def write_prometheus(path):
+    with _lock:
+        totals = sorted(_totals.items())
+    lines = [
+        '# HELP dashboard_span_seconds_total Wall time spent in each dashboard span.',
+        '# TYPE dashboard_span_seconds_total counter',
+        *(f'dashboard_span_seconds_total{{span="{name}"}} {t[1]:.6f}' for name, t in totals),
+        '# HELP dashboard_span_calls_total Number of times each dashboard span ran.',
+        '# TYPE dashboard_span_calls_total counter',
+        *(f'dashboard_span_calls_total{{span="{name}"}} {t[0]}' for name, t in totals),
+        '# HELP dashboard_span_last_seconds Wall time of the most recent run of each span.',
+        '# TYPE dashboard_span_last_seconds gauge',
+        *(f'dashboard_span_last_seconds{{span="{name}"}} {t[2]:.6f}' for name, t in totals),
+    ]
+    peaks = [(name, t[3]) for name, t in totals if t[3] is not None]
+    if peaks:
+        lines += [
+            '# HELP dashboard_span_peak_bytes Traced peak allocation of the most recent traced run of each span.',
+            '# TYPE dashboard_span_peak_bytes gauge',
+            *(f'dashboard_span_peak_bytes{{span="{name}"}} {peak:.0f}' for name, peak in peaks),
+        ]
+    # Sessions flush from different threads; the lock keeps them off the same tmp file
+    tmp_path = f"{path}.tmp"
+    with _lock:
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
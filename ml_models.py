@@ -1,22 +1,145 @@
+import os
+import json
+import time
+import hashlib
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import joblib
 import pandas as pd
-from sklearn.cluster import KMeans
+import sklearn
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LinearRegression
 import numpy as np
+from utils import CACHE_DIR, DATA_PATH, normalize_column_names
+
+# Registry location when one is asked for: next to load_data's cache of the data
+MODEL_DIR = os.environ.get("DASHBOARD_MODEL_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(DATA_PATH)), CACHE_DIR, "models"))
+CHURN_MODEL_PARAMS = {'n_estimators': 10, 'random_state': 42}
+CHURN_FEATURES = ['previous_purchases']
+SCORING_CHUNK_SIZE = 100_000
+CLUSTER_FEATURES = ['age', 'previous_purchases']
+CLUSTER_SAMPLE_SIZE = 10_000
+
+
+class ModelRegistry:
+    # Trained models on disk as <root>/<name>/<fingerprint>.joblib plus a JSON
+    # sidecar with params, training time and metrics. The fingerprint covers the
+    # training data, hyperparameters and scikit-learn version, so replicas and
+    # new sessions reuse a model instead of retraining it.
+
+    def __init__(self, root=MODEL_DIR, max_versions=3):
+        self.root = root
+        self.max_versions = max_versions
+
+    @staticmethod
+    def fingerprint(X, y, params):
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+        digest.update(pd.util.hash_pandas_object(pd.Series(y), index=False).to_numpy().tobytes())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        digest.update(sklearn.__version__.encode())
+        return digest.hexdigest()[:20]
+
+    def _path(self, name, fingerprint, ext):
+        return os.path.join(self.root, name, f"{fingerprint}.{ext}")
+
+    def load(self, name, fingerprint):
+        path = self._path(name, fingerprint, 'joblib')
+        if not os.path.exists(path):
+            return None
+        try:
+            return joblib.load(path)
+        except Exception:
+            # Unreadable or from an incompatible build: drop it and retrain
+            self.invalidate(name, fingerprint)
+            return None
+
+    def save(self, name, fingerprint, model, params, train_seconds, metrics):
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        # Written under unique temp names and renamed into place, so concurrent
+        # saves never leave a half-written model or sidecar for readers
+        tmp = f"{uuid.uuid4().hex}.tmp"
+        model_path = self._path(name, fingerprint, 'joblib')
+        joblib.dump(model, f"{model_path}.{tmp}")
+        os.replace(f"{model_path}.{tmp}", model_path)
+        meta = {
+            'name': name, 'fingerprint': fingerprint, 'params': params,
+            'sklearn_version': sklearn.__version__, 'trained_at': time.time(),
+            'train_seconds': round(train_seconds, 4), 'metrics': metrics,
+        }
+        meta_path = self._path(name, fingerprint, 'json')
+        with open(f"{meta_path}.{tmp}", 'w') as f:
+            json.dump(meta, f, default=str)
+        os.replace(f"{meta_path}.{tmp}", meta_path)
+        self.evict(name)
+        return meta
+
+    def versions(self, name):
+        folder = os.path.join(self.root, name)
+        if not os.path.isdir(folder):
+            return []
+        metas = []
+        for entry in os.listdir(folder):
+            if entry.endswith('.json'):
+                try:
+                    with open(os.path.join(folder, entry)) as f:
+                        metas.append(json.load(f))
+                except (OSError, ValueError):
+                    # Removed or rewritten by another process mid-read
+                    continue
+        return sorted(metas, key=lambda m: m['trained_at'], reverse=True)
+
+    def evict(self, name):
+        for meta in self.versions(name)[self.max_versions:]:
+            self.invalidate(name, meta['fingerprint'])
+
+    def invalidate(self, name, fingerprint=None):
+        # Drop one version, or every version of `name` when no fingerprint is given
+        fingerprints = [fingerprint] if fingerprint else [m['fingerprint'] for m in self.versions(name)]
+        for fp in fingerprints:
+            for ext in ('joblib', 'json'):
+                try:
+                    os.remove(self._path(name, fp, ext))
+                except FileNotFoundError:
+                    pass
+
+    def get_or_train(self, name, X, y, params, build):
+        fingerprint = self.fingerprint(X, y, params)
+        model = self.load(name, fingerprint)
+        if model is not None:
+            return model
+        model = build(**params)
+        start = time.perf_counter()
+        model.fit(X, y)
+        train_seconds = time.perf_counter() - start
+        self.save(name, fingerprint, model, params, train_seconds, {'train_score': float(model.score(X, y))})
+        return model
+
 
 class MLModels:
-    def __init__(self):
+    def __init__(self, registry=None):
         self.churn_model = None
         self.sales_model = None
+        # Models are trained in memory unless a ModelRegistry is passed
+        self.registry = registry
+
+    def _fit(self, name, X, y, build, params):
+        if self.registry:
+            return self.registry.get_or_train(name, X, y, params, build)
+        model = build(**params)
+        model.fit(X, y)
+        return model
 
     def train_churn_model(self, df):
         # Placeholder: train a churn prediction model
         # For demonstration, train a simple RandomForestClassifier on previous_purchases and is_returning_customer
         features = df[['previous_purchases']].fillna(0)
         target = (df['previous_purchases'] <= 1).astype(int)  # churn if <= 1 previous purchase
-        model = RandomForestClassifier(n_estimators=10, random_state=42)
-        model.fit(features, target)
-        self.churn_model = model
+        self.churn_model = self._fit('churn', features, target, RandomForestClassifier, CHURN_MODEL_PARAMS)
 
     def predict_churn(self, df):
         if self.churn_model is None:
@@ -25,6 +148,40 @@ class MLModels:
         preds = self.churn_model.predict(features)
         return preds
 
+    def iter_churn_scores(self, source, chunk_size=SCORING_CHUNK_SIZE, n_jobs=1, id_column='customer_id'):
+        # Yields one small frame per input chunk with `id_column` (when present),
+        # churn_prediction and churn_probability, in input order. `source` is a
+        # DataFrame, an iterable of DataFrames, or a CSV/Parquet path; only the
+        # id and feature columns are read. With n_jobs != 1 chunks are scored in
+        # a process pool with a bounded number of chunks in flight.
+        if self.churn_model is None:
+            raise ValueError("No churn model: call train_churn_model() before batch scoring")
+        columns = CHURN_FEATURES + [id_column]
+        chunks = (_score_input(chunk, id_column) for chunk in iter_frames(source, chunk_size, columns))
+
+        workers = os.cpu_count() if n_jobs in (None, -1) else n_jobs
+        if workers <= 1:
+            for ids, features in chunks:
+                yield _score_output(ids, id_column, *_score_features(self.churn_model, features))
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_scoring_worker,
+                                 initargs=(self.churn_model,)) as pool:
+            pending = deque()
+            for ids, features in chunks:
+                pending.append((ids, pool.submit(_score_in_worker, features)))
+                if len(pending) >= workers * 2:
+                    ids, future = pending.popleft()
+                    yield _score_output(ids, id_column, *future.result())
+            while pending:
+                ids, future = pending.popleft()
+                yield _score_output(ids, id_column, *future.result())
+
+    def score_churn(self, source, output_path, chunk_size=SCORING_CHUNK_SIZE, n_jobs=-1, id_column='customer_id'):
+        # Batch-score `source` into a CSV or Parquet file chunk by chunk; returns rows written
+        scores = self.iter_churn_scores(source, chunk_size=chunk_size, n_jobs=n_jobs, id_column=id_column)
+        return write_frames(scores, output_path)
+
     def train_sales_forecast_model(self, df):
         # Placeholder: train a simple linear regression on monthly revenue
         if 'purchase_date' not in df or 'price' not in df:
@@ -34,9 +191,7 @@ class MLModels:
         monthly_revenue['month_num'] = monthly_revenue['purchase_date'].dt.month
         X = monthly_revenue[['month_num']]
         y = monthly_revenue['price']
-        model = LinearRegression()
-        model.fit(X, y)
-        self.sales_model = model
+        self.sales_model = self._fit('sales_forecast', X, y, LinearRegression, {})
 
     def forecast_sales(self, months_ahead=3):
         if self.sales_model is None:
@@ -46,8 +201,193 @@ class MLModels:
         preds = self.sales_model.predict(future_months)
         return preds
 
-def cluster_customers(df, n_clusters=3):
+def iter_frames(source, chunk_size, columns=None):
+    # Chunks of `source` (DataFrame, iterable of DataFrames, or CSV/Parquet path),
+    # optionally restricted to `columns` that exist in the source. File headers
+    # are normalized like load_data's, whatever their original spelling.
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunk_size):
+            chunk = source.iloc[start:start + chunk_size]
+            yield chunk if columns is None else chunk[[c for c in columns if c in chunk.columns]]
+    elif isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(path)
+            raw = parquet.schema_arrow.names
+            names = None if columns is None else [r for r, c in zip(raw, normalize_column_names(raw)) if c in columns]
+            for batch in parquet.iter_batches(batch_size=chunk_size, columns=names):
+                chunk = batch.to_pandas()
+                chunk.columns = normalize_column_names(chunk.columns)
+                yield chunk
+        else:
+            wanted = None if columns is None else set(columns)
+            usecols = None if wanted is None else (lambda c: normalize_column_names([c])[0] in wanted)
+            for chunk in pd.read_csv(path, chunksize=chunk_size, usecols=usecols):
+                chunk.columns = normalize_column_names(chunk.columns)
+                yield chunk
+    else:
+        for chunk in source:
+            yield chunk if columns is None else chunk[[c for c in columns if c in chunk.columns]]
+
+
+def write_frames(frames, output_path):
+    # Append each frame to a CSV or Parquet file as it arrives; returns rows written
+    rows = 0
+    writer = None
+    try:
+        for frame in frames:
+            if output_path.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                frame.to_csv(output_path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _score_input(chunk, id_column):
+    ids = chunk[id_column].to_numpy() if id_column in chunk.columns else None
+    return ids, chunk[CHURN_FEATURES].fillna(0)
+
+
+def _score_features(model, features):
+    preds = model.predict(features)
+    classes = list(model.classes_)
+    if 1 in classes:
+        proba = model.predict_proba(features)[:, classes.index(1)]
+    else:
+        proba = np.zeros(len(features))
+    return preds, proba
+
+
+def _score_output(ids, id_column, preds, proba):
+    out = pd.DataFrame({'churn_prediction': preds, 'churn_probability': proba})
+    if ids is not None:
+        out.insert(0, id_column, ids)
+    return out
+
+
+_worker_model = None
+
+
+def _init_scoring_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _score_in_worker(features):
+    return _score_features(_worker_model, features)
+
+
+class StreamingClusterer:
+    # MiniBatchKMeans over age/previous_purchases fed one chunk at a time.
+    # Later chunks (e.g. newly appended data) keep refining the same centroids,
+    # and a new clusterer can warm-start from a previous run's centroids.
+
+    def __init__(self, n_clusters=3, init_centers=None, batch_size=4096, random_state=42):
+        init = 'k-means++' if init_centers is None else np.asarray(init_centers, dtype=float)
+        self.n_clusters = n_clusters if init_centers is None else len(init)
+        self.model = MiniBatchKMeans(n_clusters=self.n_clusters, init=init, n_init=1 if init_centers is not None else 3,
+                                     batch_size=batch_size, random_state=random_state)
+        self._pending = None
+
+    @property
+    def cluster_centers_(self):
+        return self.model.cluster_centers_
+
+    def partial_fit(self, chunk):
+        features = _cluster_features(chunk)
+        # partial_fit needs at least n_clusters rows on its first call
+        if self._pending is not None:
+            features = np.vstack([self._pending, features])
+            self._pending = None
+        if not hasattr(self.model, 'cluster_centers_') and len(features) < self.n_clusters:
+            self._pending = features
+            return self
+        self.model.partial_fit(features)
+        return self
+
+    def fit_stream(self, source, chunk_size=SCORING_CHUNK_SIZE):
+        for chunk in iter_frames(source, chunk_size, CLUSTER_FEATURES):
+            self.partial_fit(chunk)
+        return self
+
+    def predict(self, df):
+        return self.model.predict(_cluster_features(df))
+
+
+def _cluster_features(df):
+    return df[CLUSTER_FEATURES].fillna(0).to_numpy(dtype=float)
+
+
+def sample_stream(source, sample_size=CLUSTER_SAMPLE_SIZE, chunk_size=SCORING_CHUNK_SIZE, columns=CLUSTER_FEATURES, seed=42):
+    # Uniform sample of at most `sample_size` rows from a stream: every row gets
+    # a random key and only the smallest keys seen so far are kept
+    rng = np.random.default_rng(seed)
+    sample = None
+    for chunk in iter_frames(source, chunk_size, columns):
+        chunk = chunk.assign(_key=rng.random(len(chunk)))
+        sample = chunk if sample is None else pd.concat([sample, chunk], ignore_index=True)
+        sample = sample.nsmallest(sample_size, '_key')
+    if sample is None:
+        return pd.DataFrame(columns=columns)
+    return sample.drop(columns='_key').reset_index(drop=True)
+
+
+def _evaluate_k(source, k, sample_features, chunk_size, random_state):
+    clusterer = StreamingClusterer(n_clusters=k, random_state=random_state).fit_stream(source, chunk_size)
+    labels = clusterer.model.predict(sample_features)
+    silhouette = silhouette_score(sample_features, labels) if len(set(labels)) > 1 else float('nan')
+    return {
+        'k': k,
+        'inertia': float(-clusterer.model.score(sample_features)),
+        'silhouette': float(silhouette),
+        'centers': clusterer.cluster_centers_.tolist(),
+    }
+
+
+def evaluate_cluster_counts(source, k_values=(2, 3, 4, 5, 6), chunk_size=SCORING_CHUNK_SIZE,
+                            sample_size=CLUSTER_SAMPLE_SIZE, n_jobs=-1, random_state=42):
+    # Fits one streaming clusterer per candidate k (in parallel processes when
+    # n_jobs != 1) and scores each on a shared random sample of the stream.
+    # Pass a file path as `source` so each worker streams it instead of receiving a copy.
+    sample_features = _cluster_features(sample_stream(source, sample_size, chunk_size, seed=random_state))
+    workers = min(len(k_values), os.cpu_count() if n_jobs in (None, -1) else n_jobs)
+    args = [(source, k, sample_features, chunk_size, random_state) for k in k_values]
+    if workers <= 1:
+        results = [_evaluate_k(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_evaluate_k, *zip(*args)))
+    return pd.DataFrame(results).set_index('k')
+
+
+def cluster_customers(df, n_clusters=3, streaming=False, chunk_size=SCORING_CHUNK_SIZE, init_centers=None):
     # Simple clustering based on age and previous_purchases
+    if streaming:
+        clusterer = StreamingClusterer(n_clusters=n_clusters, init_centers=init_centers)
+        if isinstance(df, (pd.DataFrame, str, os.PathLike)):
+            clusterer.fit_stream(df, chunk_size)
+            chunks = iter_frames(df, chunk_size, CLUSTER_FEATURES)
+        else:
+            # An iterator of frames can only be read once: fit on it while
+            # keeping just the feature columns for the predict pass
+            chunks = []
+            for chunk in iter_frames(df, chunk_size, CLUSTER_FEATURES):
+                clusterer.partial_fit(chunk)
+                chunks.append(chunk)
+        labels = [clusterer.predict(chunk) for chunk in chunks]
+        return np.concatenate(labels) if labels else np.empty(0, dtype=np.int32)
     features = df[['age', 'previous_purchases']].fillna(0)
     kmeans = KMeans(n_clusters=n_clusters, random_state=42)
     clusters = kmeans.fit_predict(features)
@@ -0,0 +1,152 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from streaming import csv_dtypes
+from utils import (CACHE_DIR, _read_cache_meta, _write_json, normalize_column_names, normalize_data, optimize_dtypes,
+                   sort_by_date)
+
+PARTITION_EXTENSIONS = ('.csv', '.parquet')
+# Bump whenever the cached partition metadata layout changes
+PARTITION_META_VERSION = 1
+READ_WORKERS = min(8, os.cpu_count() or 1)
+META_COLUMNS = ['purchase_date', 'payment_method']
+
+
+def list_partitions(directory):
+    # Relative paths of the CSV/Parquet files under `directory`, skipping
+    # hidden entries such as the metadata cache
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.') and name.lower().endswith(PARTITION_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), directory))
+    return found
+
+
+def read_partition(path, columns=None):
+    # One partition, normalized like load_data; `columns` are normalized names
+    if path.lower().endswith('.parquet'):
+        raw_columns = None
+        if columns is not None:
+            import pyarrow.parquet as pq
+
+            names = pq.read_schema(path).names
+            raw_columns = [raw for raw, name in zip(names, normalize_column_names(names)) if name in columns]
+        df = pd.read_parquet(path, columns=raw_columns)
+    else:
+        usecols = None if columns is None else (lambda raw: normalize_column_names([raw])[0] in columns)
+        df = pd.read_csv(path, dtype=csv_dtypes(path), usecols=usecols)
+    return normalize_data(df)
+
+
+def partition_metadata(path):
+    df = read_partition(path, columns=META_COLUMNS)
+    dates = df['purchase_date'] if 'purchase_date' in df.columns else pd.Series(dtype='datetime64[ns]')
+    payments = df['payment_method'].dropna().unique() if 'payment_method' in df.columns else []
+    return {
+        'rows': len(df),
+        'min_date': None if dates.isna().all() else dates.min().isoformat(),
+        'max_date': None if dates.isna().all() else dates.max().isoformat(),
+        'payment_methods': sorted(map(str, payments)),
+    }
+
+
+class PartitionedDataset:
+    # A directory of date-partitioned exports (e.g. one file per month). Each
+    # partition's row count, date span and payment methods are cached in
+    # <directory>/.cache/partitions.json and only recomputed for files whose
+    # size or mtime changed, so pruning a date range costs no reads at all.
+
+    def __init__(self, directory, cache_dir=None, max_workers=READ_WORKERS):
+        self.directory = directory
+        self.cache_dir = cache_dir or os.path.join(directory, CACHE_DIR)
+        self.max_workers = max_workers
+        self._metadata = None
+        self._version = None
+
+    def _meta_path(self):
+        return os.path.join(self.cache_dir, 'partitions.json')
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _map(self, func, items):
+        items = list(items)
+        if len(items) <= 1 or self.max_workers <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as pool:
+            return list(pool.map(func, items))
+
+    def refresh(self):
+        # Re-scan the directory; returns the partition metadata frame
+        names = list_partitions(self.directory)
+        stats = {name: os.stat(self._path(name)) for name in names}
+        version = tuple((name, stats[name].st_size, stats[name].st_mtime_ns) for name in names)
+        if version == self._version:
+            return self._metadata
+
+        cached = _read_cache_meta(self._meta_path()) or {}
+        entries = cached.get('partitions', {}) if cached.get('version') == PARTITION_META_VERSION else {}
+        stale = [name for name in names
+                 if entries.get(name, {}).get('size') != stats[name].st_size
+                 or entries.get(name, {}).get('mtime_ns') != stats[name].st_mtime_ns]
+        for name, meta in zip(stale, self._map(lambda n: partition_metadata(self._path(n)), stale)):
+            entries[name] = {'size': stats[name].st_size, 'mtime_ns': stats[name].st_mtime_ns, **meta}
+        entries = {name: entries[name] for name in names}
+        if stale or len(entries) != len(cached.get('partitions', {})):
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                _write_json(self._meta_path(), {'version': PARTITION_META_VERSION, 'partitions': entries})
+            except OSError:
+                pass
+
+        metadata = pd.DataFrame.from_dict(entries, orient='index',
+                                          columns=['size', 'mtime_ns', 'rows', 'min_date', 'max_date', 'payment_methods'])
+        metadata.index.name = 'partition'
+        metadata['min_date'] = pd.to_datetime(metadata['min_date'])
+        metadata['max_date'] = pd.to_datetime(metadata['max_date'])
+        self._metadata, self._version = metadata, version
+        return metadata
+
+    @property
+    def metadata(self):
+        return self._metadata if self._metadata is not None else self.refresh()
+
+    @property
+    def version(self):
+        if self._version is None:
+            self.refresh()
+        return self._version
+
+    def date_bounds(self):
+        return self.metadata['min_date'].min(), self.metadata['max_date'].max()
+
+    def payment_methods(self):
+        return sorted({method for methods in self.metadata['payment_methods'] for method in methods})
+
+    def prune(self, start_date=None, end_date=None):
+        # Partitions that can hold rows in [start_date, end_date]; without a
+        # range, every partition. Undated partitions only match no range.
+        metadata = self.metadata
+        if start_date is None and end_date is None:
+            return list(metadata.index)
+        keep = metadata['min_date'].notna()
+        if end_date is not None:
+            keep &= metadata['min_date'] <= pd.Timestamp(end_date)
+        if start_date is not None:
+            keep &= metadata['max_date'] >= pd.Timestamp(start_date)
+        return list(metadata.index[keep])
+
+    def load(self, start_date=None, end_date=None):
+        # The selected partitions read in parallel and combined like load_data
+        names = self.prune(start_date, end_date)
+        frames = self._map(lambda n: read_partition(self._path(n)), names)
+        if not frames and len(self.metadata):
+            # Nothing in range: an empty frame that still has the dataset's columns
+            frames = [read_partition(self._path(self.metadata.index[0])).iloc[:0]]
+        if not frames:
+            return pd.DataFrame()
+        return sort_by_date(optimize_dtypes(pd.concat(frames, ignore_index=True)))
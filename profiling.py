@@ -0,0 +1,81 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+
+from utils import CACHE_DIR
+
+# One rerun is profiled when the page is opened with ?profile=1, or every
+# session's first rerun when DASHBOARD_PROFILE=1. Reports land in PROFILE_DIR.
+PROFILE_ENV = os.environ.get("DASHBOARD_PROFILE", "0") == "1"
+PROFILE_DIR = os.environ.get("DASHBOARD_PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))
+PROFILE_TOP_N = 30
+TRACEMALLOC_FRAMES = 10
+
+class RerunProfiler:
+    # cProfile plus tracemalloc around one rerun of the script. cProfile only
+    # sees the script thread, so chart renders on the worker pool show up as
+    # time spent waiting on their futures. Each session keeps its own
+    # profiler; see discard() for reruns that never reach stop().
+
+    def __init__(self, output_dir=PROFILE_DIR, top_n=PROFILE_TOP_N):
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.profile = cProfile.Profile()
+        self._started_tracing = False
+        self._start = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracing = True
+        self._start = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def stop(self, tags=None, fingerprint=None):
+        # Writes <stamp>-<fingerprint>.prof (load with pstats or snakeviz) and a
+        # .txt report of the top functions and allocation sites; returns the paths
+        self.profile.disable()
+        seconds = time.perf_counter() - self._start
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        if self._started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = time.strftime('%Y%m%d-%H%M%S') + (f'-{fingerprint}' if fingerprint else '')
+        prof_path = os.path.join(self.output_dir, f'{stem}.prof')
+        report_path = os.path.join(self.output_dir, f'{stem}.txt')
+        self.profile.dump_stats(prof_path)
+        with open(report_path, 'w') as f:
+            f.write(self.report(seconds, snapshot, tags))
+        return prof_path, report_path
+
+    def discard(self):
+        # Switch off a profiler whose rerun raised or was interrupted before
+        # stop(), without writing reports. cProfile hooks are per thread, so
+        # call it from the session's script thread, as the next rerun does.
+        self.profile.disable()
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+
+    def report(self, seconds, snapshot, tags=None):
+        out = io.StringIO()
+        out.write(f"Rerun: {seconds:.3f}s\n")
+        out.write(f"Filters: {json.dumps(tags or {}, sort_keys=True)}\n\n")
+        for sort_key in ('cumulative', 'tottime'):
+            out.write(f"== Top {self.top_n} functions by {sort_key} ==\n")
+            pstats.Stats(self.profile, stream=out).sort_stats(sort_key).print_stats(self.top_n)
+        if snapshot is not None:
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            ])
+            out.write(f"== Top {self.top_n} allocation sites (live at end of rerun) ==\n")
+            for stat in snapshot.statistics('lineno')[:self.top_n]:
+                out.write(f"{stat.size / 2 ** 20:10.2f} MB {stat.count:>9} blocks  {stat.traceback[0]}\n")
+        return out.getvalue()
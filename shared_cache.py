@@ -0,0 +1,130 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+# Process-wide cache of filtered views and aggregates, shared by every
+# browser session. Entries are evicted least-recently-used first once their
+# total size passes the budget, so memory grows with the number of distinct
+# queries rather than the number of users.
+CACHE_BUDGET_MB = float(os.environ.get("DASHBOARD_CACHE_BUDGET_MB", "512"))
+# Least bytes an entry is charged, for the key and bookkeeping of values that
+# hold (almost) nothing of their own, like views of a shared frame; without it
+# such entries would never count toward the budget and never be evicted
+MIN_ENTRY_BYTES = 4096
+
+
+def estimate_size(value):
+    # Approximate bytes held by a cached value
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class SharedCache:
+    # Thread-safe LRU keyed on (scope, kind, ...) tuples, where scope is
+    # (namespace, version, ...) for the data the entry was computed from.
+    # Entries are futures, so concurrent sessions asking for the same key wait
+    # for one computation instead of each running it. A computation whose
+    # entry was invalidated while it ran is returned to its callers but not
+    # stored.
+
+    def __init__(self, budget_mb=CACHE_BUDGET_MB, sizeof=estimate_size):
+        self.budget = int(budget_mb * 2 ** 20)
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, compute, sizeof=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                future = Future()
+                self._entries[key] = [future, 0]
+        if entry is not None:
+            return entry[0].result()
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                self._drop(key, future)
+            future.set_exception(exc)
+            raise
+        size = max((sizeof or self.sizeof)(value), MIN_ENTRY_BYTES)
+        future.set_result(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is future:
+                if size > self.budget:
+                    # Larger than the whole budget: served once, never kept
+                    self._drop(key, future)
+                else:
+                    entry[1] = size
+                    self.bytes += size
+                    self._evict()
+        return value
+
+    def _drop(self, key, future):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is future:
+            del self._entries[key]
+            self.bytes -= entry[1]
+
+    def _evict(self):
+        for key in list(self._entries):
+            if self.bytes <= self.budget:
+                break
+            future, size = self._entries[key]
+            if future.done():
+                del self._entries[key]
+                self.bytes -= size
+                self.evictions += 1
+
+    def invalidate(self, namespace=None, keep_version=None):
+        # Drop the entries of `namespace` not computed from `keep_version`
+        # (every entry when no namespace is given), in flight or not; returns how many
+        with self._lock:
+            stale = [key for key in self._entries
+                     if namespace is None or (key[0][0] == namespace and key[0][1] != keep_version)]
+            for key in stale:
+                self.bytes -= self._entries.pop(key)[1]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'mb': self.bytes / 2 ** 20,
+                'budget_mb': self.budget / 2 ** 20,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+SHARED_CACHE = SharedCache()
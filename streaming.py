@@ -0,0 +1,303 @@
+import os
+import hashlib
+import threading
+from io import BytesIO
+
+import pandas as pd
+
+from utils import (DATA_PATH, WEEKDAYS, _parse_csv, append_rows, load_data, normalize_column_names, normalize_data,
+                   source_version)
+
+STREAM_CHUNK_SIZE = 250_000
+# Bytes just before the last ingested offset that must be unchanged (along
+# with the header) for the file to count as appended to rather than rewritten
+TAIL_CHECK_BYTES = 64 * 1024
+
+# Parse dtypes by normalized column name. Fixing them up front skips pandas'
+# per-chunk type inference and keeps every chunk on the same small dtypes;
+# columns not listed here are inferred as usual. Numbers match what
+# optimize_dtypes makes of load_data's frame (whole-dollar amounts are a
+# 32-bit measure, ratings stay float64), so every ingestion path yields one
+# schema. Integers are the nullable kind, so a blank cell is NA here as it is
+# in load_data rather than an error.
+CSV_DTYPES = {
+    'customer_id': 'str',
+    'age': 'Int16',
+    'gender': 'category',
+    'item_purchased': 'category',
+    'category': 'category',
+    'purchase_amount_(usd)': 'Int32',
+    'location': 'category',
+    'size': 'category',
+    'color': 'category',
+    'season': 'category',
+    'review_rating': 'float64',
+    'subscription_status': 'str',
+    'payment_method': 'category',
+    'shipping_type': 'category',
+    'discount_applied': 'category',
+    'promo_code_used': 'category',
+    'previous_purchases': 'Int32',
+    'preferred_payment_method': 'category',
+    'frequency_of_purchases': 'category',
+    'purchase_date': 'str',
+    'customer_type': 'str',
+    'price': 'float64',
+}
+
+# Aggregates kept while streaming: row counts per value of each COUNT_COLUMNS
+# column and running totals of each SUM_COLUMNS column present in the source
+COUNT_COLUMNS = ['payment_method', 'category', 'gender', 'is_returning_customer',
+                 'frequency_of_purchases', 'month', 'day_of_week']
+SUM_COLUMNS = ['previous_purchases', 'purchase_amount_(usd)', 'price']
+
+
+def csv_dtypes(path):
+    # CSV_DTYPES keyed by the file's own header spelling, as read_csv expects
+    header = pd.read_csv(path, nrows=0).columns
+    return {raw: CSV_DTYPES[name] for raw, name in zip(header, normalize_column_names(header)) if name in CSV_DTYPES}
+
+
+def iter_csv_chunks(path=DATA_PATH, chunk_size=STREAM_CHUNK_SIZE):
+    # Normalized chunks of the CSV, derived exactly like load_data's frame;
+    # only one chunk is held in memory at a time
+    with pd.read_csv(path, dtype=csv_dtypes(path), chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield normalize_data(chunk)
+
+
+class TransactionAggregates:
+    # Running totals over a stream of normalized chunks. Memory grows with the
+    # number of distinct values and customers, never with the number of rows.
+    # Per-chunk first purchases are buffered and folded into the running
+    # per-customer minimum once the buffer outgrows it, so the fold is
+    # amortized linear instead of a full merge per chunk.
+
+    def __init__(self):
+        self.rows = 0
+        self.counts = {}
+        self.sums = {}
+        # Non-null values behind each sum, so averages skip missing cells
+        self.known = {}
+        self.min_date = pd.NaT
+        self.max_date = pd.NaT
+        self._first = pd.Series(dtype='datetime64[ns]', index=pd.Index([], dtype='str', name='customer_id'))
+        self._pending = []
+        self._pending_rows = 0
+
+    def update(self, chunk):
+        self.rows += len(chunk)
+        for column in COUNT_COLUMNS:
+            if column in chunk.columns:
+                counts = chunk[column].value_counts()
+                self._add_counts(column, counts[counts > 0])
+        for column in SUM_COLUMNS:
+            if column in chunk.columns:
+                self.sums[column] = self.sums.get(column, 0) + chunk[column].sum()
+                self.known[column] = self.known.get(column, 0) + int(chunk[column].count())
+        if 'purchase_date' in chunk.columns:
+            dates = chunk['purchase_date']
+            self.min_date = _earliest(self.min_date, dates.min())
+            self.max_date = _latest(self.max_date, dates.max())
+            if 'customer_id' in chunk.columns:
+                self._add_first_purchases(dates.groupby(chunk['customer_id'].to_numpy(), sort=False).min())
+        return self
+
+    def merge(self, other):
+        # Fold another aggregator (e.g. from a separate chunk range) into this one
+        self.rows += other.rows
+        for column, counts in other.counts.items():
+            self._add_counts(column, counts)
+        for column, total in other.sums.items():
+            self.sums[column] = self.sums.get(column, 0) + total
+        for column, known in other.known.items():
+            self.known[column] = self.known.get(column, 0) + known
+        self.min_date = _earliest(self.min_date, other.min_date)
+        self.max_date = _latest(self.max_date, other.max_date)
+        self._add_first_purchases(other.first_purchases)
+        return self
+
+    def _add_counts(self, column, counts):
+        counts = counts.astype('int64')
+        counts.index = counts.index.astype(object)
+        current = self.counts.get(column)
+        self.counts[column] = counts if current is None else current.add(counts, fill_value=0).astype('int64')
+
+    def _add_first_purchases(self, firsts):
+        self._pending.append(firsts)
+        self._pending_rows += len(firsts)
+        if self._pending_rows > max(len(self._first), STREAM_CHUNK_SIZE):
+            self._compact()
+
+    def _compact(self):
+        if self._pending:
+            merged = pd.concat([self._first, *self._pending])
+            self._first = merged.groupby(level=0, sort=False).min().rename_axis('customer_id')
+            self._pending = []
+            self._pending_rows = 0
+
+    @property
+    def first_purchases(self):
+        # Earliest purchase date per customer (NaT if none of their rows had a date)
+        self._compact()
+        return self._first
+
+    @property
+    def distinct_customers(self):
+        return len(self.first_purchases)
+
+    def cohort_sizes(self, freq='M'):
+        # New customers per first-purchase period
+        firsts = self.first_purchases.dropna()
+        return firsts.dt.to_period(freq).value_counts().sort_index().rename_axis('cohort_month').rename('customers')
+
+    def value_counts(self, column):
+        counts = self.counts.get(column, pd.Series(dtype='int64'))
+        return counts.sort_values(ascending=False, kind='stable').rename('count').rename_axis(column)
+
+    def summary(self):
+        known = self.known.get('previous_purchases', 0)
+        segments = self.counts.get('is_returning_customer', pd.Series(dtype='int64'))
+        weekdays = self.counts.get('day_of_week', pd.Series(dtype='int64')).reindex(WEEKDAYS, fill_value=0)
+        return {
+            'total_transactions': self.rows,
+            'distinct_customers': self.distinct_customers,
+            'returning_percentage': segments.get(1, 0) / self.rows * 100 if self.rows else 0,
+            'avg_previous_purchases': self.sums.get('previous_purchases', 0) / known if known else float('nan'),
+            'total_revenue': float(self.sums['price']) if 'price' in self.sums else None,
+            'date_range': (self.min_date, self.max_date),
+            'payment_counts': self.value_counts('payment_method'),
+            'weekday_counts': weekdays,
+        }
+
+
+def _earliest(*dates):
+    return min((d for d in dates if pd.notna(d)), default=pd.NaT)
+
+
+def _latest(*dates):
+    return max((d for d in dates if pd.notna(d)), default=pd.NaT)
+
+
+def stream_aggregates(path=DATA_PATH, chunk_size=STREAM_CHUNK_SIZE, aggregates=None):
+    # Aggregate a CSV of any size chunk by chunk, never building the full frame
+    aggregates = aggregates if aggregates is not None else TransactionAggregates()
+    for chunk in iter_csv_chunks(path, chunk_size):
+        aggregates.update(chunk)
+    return aggregates
+
+
+class TailIngestor:
+    # Keeps a loaded frame and its aggregates in step with a CSV that only
+    # grows by appends. refresh() parses just the complete lines written
+    # since the last call; if the bytes already ingested changed (truncated,
+    # rewritten, different header) it falls back to a full rebuild. `tail`
+    # is (version before, rows appended) for the last refresh that appended,
+    # so derived state can be extended rather than rebuilt (see
+    # backends.LiveBackend); None after a rebuild.
+
+    def __init__(self, path=DATA_PATH, chunk_size=STREAM_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.frame = None
+        self.aggregates = None
+        self.offset = 0
+        self.rows = 0
+        self.rebuilds = 0
+        self.tail = None
+        self._header = b''
+        self._checksum = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        # Changes whenever refresh() changed the frame; usable as a cache key
+        return (self.rebuilds, self.rows)
+
+    def snapshot(self):
+        # (version, frame) read together, for callers sharing the ingestor across threads
+        with self._lock:
+            return self.version, self.frame
+
+    def cohort_sizes(self, freq='M'):
+        # refresh() updates the aggregates in place, so they are read under the lock
+        with self._lock:
+            return self.aggregates.cohort_sizes(freq)
+
+    def refresh(self):
+        # Returns the number of rows appended, or None after a full rebuild
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        if self.frame is None or not self._is_append():
+            self._rebuild()
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            tail = f.read()
+        end = tail.rfind(b'\n') + 1
+        if end == 0:
+            # Nothing new, or a line still being written: pick it up next time
+            return 0
+        base, chunks = self.version, []
+        dtypes = csv_dtypes(self.path)
+        with pd.read_csv(BytesIO(self._header + tail[:end]), dtype=dtypes, chunksize=self.chunk_size) as reader:
+            for chunk in reader:
+                chunk = normalize_data(chunk)
+                self.aggregates.update(chunk)
+                self.frame = append_rows(self.frame, chunk)
+                chunks.append(chunk)
+        appended = sum(len(chunk) for chunk in chunks)
+        self.offset += end
+        self.rows += appended
+        if appended:
+            self.tail = (base, pd.concat(chunks, ignore_index=True))
+        self._checksum = self._window_checksum()
+        return appended
+
+    def _rebuild(self):
+        # Only the bytes present when the rebuild starts are ingested; rows
+        # appended meanwhile are left for the next refresh, so a file that is
+        # written to continuously never keeps the rebuild from finishing
+        frame, offset = self._load_complete_lines(source_version(self.path))
+        self.frame = frame
+        self.aggregates = TransactionAggregates().update(frame)
+        self.offset = offset
+        self.rows = len(frame)
+        self.rebuilds += 1
+        self.tail = None
+        with open(self.path, 'rb') as f:
+            self._header = f.readline()
+        self._checksum = self._window_checksum()
+
+    def _load_complete_lines(self, version):
+        # The frame of every complete line among the file's first `size`
+        # bytes and the offset just past them. A last line still being
+        # written is left for the next refresh, so the offset never lands
+        # mid-line. load_data (and its cache) serves the common case of a
+        # file that ended in a newline and did not change while it was read.
+        size = version[0]
+        with open(self.path, 'rb') as f:
+            f.seek(max(0, size - 1))
+            if size == 0 or f.read(1) == b'\n':
+                frame = load_data(self.path)
+                if source_version(self.path) == version:
+                    return frame, size
+            f.seek(0)
+            data = f.read(size)
+        end = data.rfind(b'\n') + 1
+        return _parse_csv(BytesIO(data[:end] if end else data)), end
+
+    def _window_checksum(self):
+        # Hash of the header line and the bytes just before `offset`
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            f.seek(max(0, self.offset - TAIL_CHECK_BYTES))
+            window = f.read(min(self.offset, TAIL_CHECK_BYTES))
+        return hashlib.sha256(header + b'\0' + window).hexdigest()
+
+    def _is_append(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < self.offset:
+            return False
+        return self._window_checksum() == self._checksum
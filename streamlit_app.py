@@ -1,11 +1,22 @@
+import os
+import uuid
 import streamlit as st
 import seaborn as sns
-import matplotlib.pyplot as plt
 import pandas as pd
 from io import BytesIO
 from calendar import month_name
-from utils import load_data, to_excel
+from utils import DATA_PATH, EXPORT_FORMATS, source_version, to_excel
+from filters import FilterSpec
+from backends import BACKEND, LiveBackend, PandasBackend, open_backend
+from streaming import TailIngestor
+from partitions import PartitionedDataset
+from approx import APPROXIMATE, approx_cohort_matrices, approximate_counts, period_sketches, sketch_estimates, union_sketch
+from compute import churn_kpis, dataset_key, load_snapshot
 from ml_models import MLModels, cluster_customers
+import charts
+from instrumentation import TRACE_MEMORY, Recorder
+from shared_cache import SHARED_CACHE
+from profiling import PROFILE_ENV, RerunProfiler
 
 import streamlit.components.v1 as components
 
@@ -28,14 +39,114 @@ components.html(
 st.set_page_config(page_title="Customer Transaction Insights Dashboard", layout="wide")
 sns.set(style='whitegrid')
 
-df = load_data()
+# ?profile=1 (or DASHBOARD_PROFILE=1, once per session) runs this rerun under
+# cProfile and tracemalloc; the reports are written at the end of the script
+profile_rerun = st.query_params.get("profile") == "1" or (PROFILE_ENV and not st.session_state.get("profiled"))
+# Profilers are per session: one this session left running (its rerun raised
+# or was cut short by a newer one) is switched off before anything starts
+stale_profiler = st.session_state.pop("profiler", None)
+if stale_profiler is not None:
+    stale_profiler.discard()
+profiler = RerunProfiler().start() if profile_rerun else None
+if profiler is not None:
+    st.session_state["profiler"] = profiler
+
+# Timing spans for this rerun, shown in the sidebar's Performance panel and
+# appended to the metrics files (see instrumentation.py)
+perf = Recorder(
+    trace_memory=TRACE_MEMORY or st.session_state.get("trace_memory", False),
+    session=st.session_state.setdefault("session_id", uuid.uuid4().hex[:12]),
+)
+
+
+@st.cache_resource(show_spinner=False)
+def get_live_backend():
+    # In-memory pandas by default. Rows appended to the CSV are parsed
+    # incrementally on the next rerun and folded into the previous backend's
+    # cube; the frame is shared by reference with every session (copy-on-write
+    # keeps it immutable), and filtered views and aggregates live in the
+    # process-wide SHARED_CACHE, where entries for older data are dropped.
+    return LiveBackend(TailIngestor(DATA_PATH), cache=SHARED_CACHE, namespace=DATA_PATH)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_backend(kind, data_version):
+    # DASHBOARD_BACKEND=sqlite|duckdb queries an embedded database instead (see backends.py)
+    return open_backend(kind, DATA_PATH)
+
+
+@st.cache_resource(show_spinner=False)
+def get_dataset():
+    return PartitionedDataset(DATA_PATH)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def get_partition_backend(data_version, start_date, end_date):
+    # Only the partitions overlapping the selected dates are read
+    SHARED_CACHE.invalidate(DATA_PATH, keep_version=data_version)
+    return PandasBackend(get_dataset().load(start_date, end_date), cache=SHARED_CACHE,
+                         scope=(DATA_PATH, data_version, start_date, end_date))
+
+
+# DATA_PATH may be a directory of monthly partitions; then the backend can
+# only be built once the date range is known
+partitioned = os.path.isdir(DATA_PATH)
+with perf.span("load_data"):
+    if partitioned:
+        dataset = get_dataset()
+        dataset.refresh()
+    elif BACKEND == 'pandas':
+        live = get_live_backend()
+        backend = live.current()
+        data_version = backend.scope[1]
+    else:
+        data_version = source_version(DATA_PATH)
+        backend = get_backend(BACKEND, data_version)
+    if not partitioned:
+        options = backend.options()
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def get_customer_sketches(data_version, _backend):
+    return period_sketches(_backend.rows())
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def get_approx_cohorts(data_version, _backend):
+    return approx_cohort_matrices(_backend.rows())
+
+
+def chart_counts(column):
+    # (counts, 95% error bound): exact from the backend, or estimated from a
+    # stratified sample in approximate mode once the view is large enough.
+    # Estimates share the backend's SHARED_CACHE scope, so they are computed
+    # once per data version, filter spec and column across sessions.
+    if approximate:
+        estimate = SHARED_CACHE.get((backend.scope, 'approx_counts', (filter_spec, column)),
+                                    lambda: approximate_counts(backend.rows(filter_spec), column))
+        estimate = estimate[estimate['estimate'] > 0]
+        return estimate['estimate'].rename('count'), float(estimate['error'].max()) if len(estimate) else 0.0
+    if snapshot is not None and column in snapshot['value_counts']:
+        return snapshot['value_counts'][column], 0.0
+    return backend.value_counts(column, filter_spec), 0.0
+
+
+def caption_error(error):
+    if error > 0:
+        st.caption(f"Estimated from a stratified sample; each bar is within ±{error:,.0f} transactions (95%).")
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def build_excel_report(data_version, spec_fingerprint, _backend, _spec):
+    # `_backend` and `_spec` are excluded from hashing; the fingerprint and data version identify them
+    return to_excel(_backend.rows(_spec))
+
 
 # Sidebar filters
 st.sidebar.header("Filters")
 
 # Date range filters split into two separate inputs for independent control
-min_date = df['purchase_date'].min()
-max_date = df['purchase_date'].max()
+min_date, max_date = dataset.date_bounds() if partitioned else options['date_bounds']
 
 start_date = st.sidebar.date_input("From date", value=min_date, min_value=min_date, max_value=max_date, key="start_date")
 end_date = st.sidebar.date_input("To date", value=max_date, min_value=min_date, max_value=max_date, key="end_date")
@@ -46,35 +157,50 @@ if start_date > end_date:
     # Optionally, prevent filtering with invalid range by resetting end_date to start_date
     end_date = start_date
 
+if partitioned:
+    data_version = (dataset.version, start_date, end_date)
+    with perf.span("load_partitions"):
+        backend = get_partition_backend(dataset.version, start_date, end_date)
+        options = backend.options()
+
 # Customer type filter
 customer_type = st.sidebar.multiselect("Select customer type", options=['New', 'Returning'], default=['New', 'Returning'])
 
 # Advanced filters: demographics and product categories
-age_min = int(df['age'].min()) if 'age' in df.columns else None
-age_max = int(df['age'].max()) if 'age' in df.columns else None
+age_min, age_max = options['age_bounds'] or (None, None)
 age_range = (age_min, age_max)
 if age_min is not None and age_max is not None:
     age_range = st.sidebar.slider("Select Age Range", min_value=age_min, max_value=age_max, value=(age_min, age_max))
 
-gender_options = df['gender'].dropna().unique().tolist() if 'gender' in df.columns else []
+gender_options = options['gender']
 selected_genders = st.sidebar.multiselect("Select Gender", options=gender_options, default=gender_options)
 
-product_categories = df['category'].dropna().unique().tolist() if 'category' in df.columns else []
+product_categories = options['category']
 selected_categories = st.sidebar.multiselect("Select Product Categories", options=product_categories, default=product_categories)
 
 # Price range filter (new)
-price_min = float(df['price'].min()) if 'price' in df.columns else None
-price_max = float(df['price'].max()) if 'price' in df.columns else None
+price_min, price_max = options['price_bounds'] or (None, None)
 price_range = (price_min, price_max)
 if price_min is not None and price_max is not None:
     price_range = st.sidebar.slider("Select Price Range (USD)", min_value=price_min, max_value=price_max, value=(price_min, price_max), step=0.01)
 
 # Payment method filter
-payment_methods = df['payment_method'].unique().tolist()
+payment_methods = options['payment_method']
 selected_payments = st.sidebar.multiselect("Select payment methods", options=payment_methods, default=payment_methods)
 
 # Churn threshold slider
-churn_threshold = st.sidebar.slider("Churn threshold (max previous purchases)", min_value=1, max_value=int(df['previous_purchases'].max()), value=1)
+churn_threshold = st.sidebar.slider("Churn threshold (max previous purchases)", min_value=1, max_value=options['max_previous_purchases'], value=1)
+
+filter_spec = FilterSpec.from_selection(
+    start_date=start_date,
+    end_date=end_date,
+    age_range=age_range,
+    price_range=price_range,
+    payment_methods=selected_payments,
+    genders=selected_genders if len(gender_options) > 0 else None,
+    categories=selected_categories if len(product_categories) > 0 else None,
+    customer_types=customer_type,
+)
 
 # Chart visibility toggles
 st.sidebar.header("Toggle Charts")
@@ -85,6 +211,13 @@ show_purchase_freq = st.sidebar.checkbox("Frequency of Purchases", value=True)
 show_churn = st.sidebar.checkbox("Customer Churn", value=True)
 show_time_trends = st.sidebar.checkbox("Time-Based Trends", value=True)
 
+# Approximate mode: sampled chart data and sketch-based customer counts, each
+# shown with its 95% error bound. Needs the rows in memory (pandas backend).
+approximate = backend.name == 'pandas' and st.sidebar.checkbox(
+    "Approximate mode", value=APPROXIMATE,
+    help="Estimate large distributions from a stratified sample and distinct customers with HyperLogLog sketches.",
+)
+
 # Enhanced styles with improved insight visibility
 st.markdown(
     """
@@ -207,156 +340,125 @@ with st.container():
     st.markdown("Extract actionable insights on churn, behavior, and segments — powered by real-time analytics and data storytelling.")
     st.markdown('</div>', unsafe_allow_html=True)
 
-with st.container():
-    st.markdown('<div class="content">', unsafe_allow_html=True)
 
-    tabs = st.tabs(["Overview", "Analytics", "Cohort Analysis", "Churn Summary", "Raw Data", "Data Dictionary"])
-
-    with tabs[0]:
-        # Overview tab content
-        # Filter data based on selections
-        filtered_df = df[
-            (df['purchase_date'] >= pd.to_datetime(start_date)) &
-            (df['purchase_date'] <= pd.to_datetime(end_date)) &
-            (df['payment_method'].isin(selected_payments))
-        ]
-
-        if age_min is not None and age_max is not None:
-            filtered_df = filtered_df[(filtered_df['age'] >= age_range[0]) & (filtered_df['age'] <= age_range[1])]
-
-        if len(gender_options) > 0:
-            filtered_df = filtered_df[filtered_df['gender'].isin(selected_genders)]
-
-        if len(product_categories) > 0:
-            filtered_df = filtered_df[filtered_df['category'].isin(selected_categories)]
-
-        # Price range filter (new)
-        if price_min is not None and price_max is not None:
-            filtered_df = filtered_df[(filtered_df['price'] >= price_range[0]) & (filtered_df['price'] <= price_range[1])]
-
-        # Map customer type selection to binary values
-        customer_type_map = {'new': 0, 'returning': 1}
-        selected_customer_type_vals = [customer_type_map[ct.lower()] for ct in customer_type]
-        filtered_df = filtered_df[filtered_df['is_returning_customer'].astype(int).isin(selected_customer_type_vals)]
-
-        # Summary KPIs
-        st.subheader("Key Performance Indicators")
-        total_customer_types = filtered_df['is_returning_customer'].nunique()
-        total_transactions = filtered_df.shape[0]
-        avg_purchases = filtered_df['previous_purchases'].mean()
-        col1, col2, col3 = st.columns(3)
-
-        # KPI cards with enhanced insight visibility
-        with col1:
-            st.markdown(f'''
-            <div class="kpi-capsule">
-                <div class="kpi-value">{total_customer_types}</div>
-                <div class="kpi-label">Customer Types Present</div>
-            </div>
-            ''', unsafe_allow_html=True)
-            returning_percentage = ((filtered_df['is_returning_customer'] == 1).sum() / len(filtered_df)) * 100 if len(filtered_df) > 0 else 0
-            st.markdown(f'''
-            <div class="kpi-insight-list">
-                <ul>
-                    <li><strong>Insight:</strong> Returning customers make up {returning_percentage:.1f}% of the data.</li>
-                </ul>
-            </div>
-            ''', unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f'''
-            <div class="kpi-capsule">
-                <div class="kpi-value">{total_transactions:,}</div>
-                <div class="kpi-label">Total Transactions</div>
-            </div>
-            ''', unsafe_allow_html=True)
-            st.markdown(f'''
-            <div class="kpi-insight-list">
-                <ul>
-                    <li><strong>Insight:</strong> Average transactions per customer is {avg_purchases:.2f}.</li>
-                </ul>
-            </div>
-            ''', unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown(f'''
-            <div class="kpi-capsule">
-                <div class="kpi-value">{avg_purchases:.2f}</div>
-                <div class="kpi-label">Average Previous Purchases</div>
-            </div>
-            ''', unsafe_allow_html=True)
-            st.markdown('''
-            <div class="kpi-insight-list">
-                <ul>
-                    <li><strong>Insight:</strong> Higher average indicates loyal customers.</li>
-                </ul>
-            </div>
-            ''', unsafe_allow_html=True)
-
-        if show_purchase_count:
+# Tab bodies. Each tab computes its own inputs, so only the selected tab pays
+# for its aggregates, charts and exports.
+def filtered_summary():
+    # KPIs and dimension counts: a precomputed snapshot, the pre-aggregated
+    # cube (or the filtered rows) in memory, or a GROUP BY query
+    with perf.span("filter_summary"):
+        return snapshot['summary'] if snapshot is not None else backend.summary(filter_spec)
+
+
+def filtered_churn(summary):
+    # Cumulative churn counts per customer type for the current filters: moving
+    # the threshold slider is a lookup on this curve, not a recount
+    with perf.span("filter_churn_curve"):
+        churn_curve = snapshot['churn_curve'] if snapshot is not None else backend.churn_curve(filter_spec)
+    return churn_curve, churn_kpis(churn_curve, churn_threshold, summary['total_transactions'])
+
+
+def overview_tab():
+    # Overview tab content
+    summary = filtered_summary()
+    payment_counts = summary['payment_counts']
+    # Submitted up front so the chart draws while the KPIs and counts are built
+    if show_payment_pref:
+        charts.submit(charts.payment_preferences, payment_counts)
+    # Summary KPIs
+    st.subheader("Key Performance Indicators")
+    total_customer_types = summary['customer_types_present']
+    total_transactions = summary['total_transactions']
+    avg_purchases = summary['avg_previous_purchases']
+    col1, col2, col3 = st.columns(3)
+
+    # KPI cards with enhanced insight visibility
+    with col1:
+        st.markdown(f'''
+        <div class="kpi-capsule">
+            <div class="kpi-value">{total_customer_types}</div>
+            <div class="kpi-label">Customer Types Present</div>
+        </div>
+        ''', unsafe_allow_html=True)
+        returning_percentage = summary['returning_percentage']
+        st.markdown(f'''
+        <div class="kpi-insight-list">
+            <ul>
+                <li><strong>Insight:</strong> Returning customers make up {returning_percentage:.1f}% of the data.</li>
+            </ul>
+        </div>
+        ''', unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f'''
+        <div class="kpi-capsule">
+            <div class="kpi-value">{total_transactions:,}</div>
+            <div class="kpi-label">Total Transactions</div>
+        </div>
+        ''', unsafe_allow_html=True)
+        st.markdown(f'''
+        <div class="kpi-insight-list">
+            <ul>
+                <li><strong>Insight:</strong> Average transactions per customer is {avg_purchases:.2f}.</li>
+            </ul>
+        </div>
+        ''', unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f'''
+        <div class="kpi-capsule">
+            <div class="kpi-value">{avg_purchases:.2f}</div>
+            <div class="kpi-label">Average Previous Purchases</div>
+        </div>
+        ''', unsafe_allow_html=True)
+        st.markdown('''
+        <div class="kpi-insight-list">
+            <ul>
+                <li><strong>Insight:</strong> Higher average indicates loyal customers.</li>
+            </ul>
+        </div>
+        ''', unsafe_allow_html=True)
+
+    if show_purchase_count:
+        with perf.span("chart:previous_purchase_count"):
             st.subheader("Previous Purchase Count")
             st.caption("This section provides an overview of customer loyalty by showing the distribution of customers based on their number of previous purchases.")
             st.markdown('<div class="section-insight"><strong>Previous Purchase Count:</strong> This chart shows the distribution of customers based on how many previous purchases they have made, indicating loyalty levels.</div>', unsafe_allow_html=True)
-            hist_values = filtered_df['previous_purchases'].value_counts().sort_index()
-            st.bar_chart(hist_values)
+            hist_values, hist_error = chart_counts('previous_purchases')
+            st.bar_chart(hist_values.sort_index())
+            caption_error(hist_error)
 
-        if show_payment_pref:
+    if show_payment_pref:
+        with perf.span("chart:payment_preferences"):
             st.subheader("Payment Method Preferences")
             st.caption("This section highlights the payment methods preferred by customers, providing insights into popular transaction modes.")
             st.markdown('<div class="section-insight"><strong>Payment Method Preferences:</strong> This section shows the distribution of payment methods used by customers, highlighting popular transaction modes.</div>', unsafe_allow_html=True)
-            
-            payment_counts = filtered_df['payment_method'].value_counts()
-            fig, ax = plt.subplots(1, 2, figsize=(12, 5))
-
-            # Count plot
-            sns.countplot(data=filtered_df, y='payment_method', order=payment_counts.index, hue='payment_method', palette="Set2", legend=False, ax=ax[0])
-            ax[0].set_title("Payment Method Usage (Count Plot)")
-            ax[0].set_xlabel("Count")
-            ax[0].set_ylabel("Payment Method")
-
-            # Pie chart
-            colors = sns.color_palette('Set2')[0:len(payment_counts)]
-            ax[1].pie(payment_counts.values, labels=payment_counts.index, colors=colors, autopct='%1.1f%%', startangle=140)
-            ax[1].set_title("Payment Method Usage (Pie Chart)")
-
-            st.pyplot(fig)
+        
+            st.image(charts.render(charts.payment_preferences, payment_counts), width="stretch")
 
-        if show_purchase_freq:
+    if show_purchase_freq:
+        with perf.span("chart:purchase_frequency"):
             st.subheader("Frequency of Purchases")
             st.caption("This section analyzes how frequently customers make purchases, categorized by their selected frequency labels.")
             st.markdown('<div class="section-insight"><strong>Frequency of Purchases:</strong> This chart shows how frequently customers make purchases, based on their selected frequency labels.</div>', unsafe_allow_html=True)
-            purchase_freq = filtered_df['frequency_of_purchases'].value_counts()
+            purchase_freq, freq_error = chart_counts('frequency_of_purchases')
             st.bar_chart(purchase_freq)
+            caption_error(freq_error)
 
-        if show_churn:
+    if show_churn:
+        churn_summary = filtered_churn(summary)[1]['churned']
+        with perf.span("chart:customer_churn"):
             st.subheader("Customer Churn")
             st.caption(f"This section identifies customers likely to have churned, defined as those with {churn_threshold} or fewer previous purchases, segmented by new vs returning customers.")
             st.markdown('<div class="section-insight"><strong>Customer Churn:</strong> This chart identifies customers likely to have churned based on their low number of previous purchases, segmented by new vs returning.</div>', unsafe_allow_html=True)
-            churned = filtered_df[filtered_df['previous_purchases'] <= churn_threshold]
-            churn_summary = churned['is_returning_customer'].value_counts()
-
-            # Ensure both 'New' and 'Returning' labels are present in the churn_summary
-            for label in [0, 1]:
-                if label not in churn_summary.index:
-                    churn_summary.loc[label] = 0
-            churn_summary = churn_summary.sort_index()
-            churn_summary.index = churn_summary.index.map({0: 'New', 1: 'Returning'})
-
             st.bar_chart(churn_summary)
 
-        # Extra curiosity: how do payment preferences differ by customer type?
-        with st.expander("Payment Method Split by Customer Type"):
-            cross_tab = pd.crosstab(filtered_df['payment_method'], filtered_df['is_returning_customer'])
-            # Fix: Only rename columns if both 0 and 1 are present to avoid length mismatch error
-            if set(cross_tab.columns) == {0, 1}:
-                cross_tab.columns = ['New', 'Returning']
-            elif set(cross_tab.columns) == {0}:
-                cross_tab.columns = ['New']
-            elif set(cross_tab.columns) == {1}:
-                cross_tab.columns = ['Returning']
-            st.dataframe(cross_tab)
-
-        if show_time_trends:
+    # Extra curiosity: how do payment preferences differ by customer type?
+    with st.expander("Payment Method Split by Customer Type"):
+        st.dataframe(summary['payment_by_customer_type'])
+
+    if show_time_trends:
+        with perf.span("chart:time_trends"):
             # Time-Based Trends
             st.subheader("🕒 Time-Based Transaction Trends")
             st.caption("Monthly and weekday patterns in customer purchases.")
@@ -364,181 +466,239 @@ with st.container():
 
             # Monthly trend with proper month names
             st.markdown("**Monthly Transaction Volume**")
-            monthly = (
-                filtered_df.groupby(['month', 'month_name']).size()
-                .reset_index(name='transaction_count')
-                .sort_values('month')
-            )
-            monthly.set_index('month_name', inplace=True)
-            st.line_chart(monthly['transaction_count'])
+            st.line_chart(summary['monthly_counts'])
 
             # Weekly trend
             st.markdown("**Transactions by Day of Week**")
-            weekly = filtered_df['day_of_week'].value_counts().reindex(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
-            st.bar_chart(weekly)
-
-    with tabs[1]:
-        # Analytics tab content
-        filtered_df = df[
-            (df['purchase_date'] >= pd.to_datetime(start_date)) &
-            (df['purchase_date'] <= pd.to_datetime(end_date)) &
-            (df['payment_method'].isin(selected_payments))
-        ]
-
-        if age_min is not None and age_max is not None:
-            filtered_df = filtered_df[(filtered_df['age'] >= age_range[0]) & (filtered_df['age'] <= age_range[1])]
+            st.bar_chart(summary['weekday_counts'])
 
-        if len(gender_options) > 0:
-            filtered_df = filtered_df[filtered_df['gender'].isin(selected_genders)]
 
-        if len(product_categories) > 0:
-            filtered_df = filtered_df[filtered_df['category'].isin(selected_categories)]
-
-        # Price range filter (new)
-        if price_min is not None and price_max is not None:
-            filtered_df = filtered_df[(filtered_df['price'] >= price_range[0]) & (filtered_df['price'] <= price_range[1])]
-
-        # Map customer type selection to binary values
-        customer_type_map = {'new': 0, 'returning': 1}
-        selected_customer_type_vals = [customer_type_map[ct.lower()] for ct in customer_type]
-        filtered_df = filtered_df[filtered_df['is_returning_customer'].astype(int).isin(selected_customer_type_vals)]
-
-        if show_segmentation:
+def analytics_tab():
+    # Analytics tab content
+    if show_segmentation:
+        with perf.span("chart:customer_segmentation"):
             st.subheader("Customer Segmentation")
             st.caption("Are people coming back, or just testing the waters?")
-            
+        
             st.markdown('<div class="section-insight"><strong>Customer Segmentation:</strong> This section shows the distribution of new vs returning customers using bar and pie charts, helping identify customer loyalty patterns.</div>', unsafe_allow_html=True)
-            
-            segment_counts = filtered_df['is_returning_customer'].value_counts().rename({0: 'New', 1: 'Returning'})
-            fig, ax = plt.subplots(1, 2, figsize=(12, 5))
-
-            sns.barplot(x=segment_counts.index, y=segment_counts.values, hue=segment_counts.index, palette='pastel', legend=True, ax=ax[0])
-            ax[0].set_title("Customer Segmentation: New vs Returning (Bar Plot)")
-            ax[0].set_ylabel("Number of Customers")
-            ax[0].legend(title='Customer Type')
-
-            colors = sns.color_palette('pastel')[0:2]
-            ax[1].pie(segment_counts.values, labels=segment_counts.index, colors=colors, autopct='%1.1f%%', startangle=140)
-            ax[1].set_title("Customer Segmentation: New vs Returning (Pie Chart)")
-
-            st.pyplot(fig)
-
-        # Add download excel report button here for better visibility
-        excel_data = to_excel(filtered_df)
-        st.download_button(
-            label="Download Excel Report",
-            data=excel_data,
-            file_name="customer_transaction_insights_report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-
-    with tabs[2]:
-        # Cohort Analysis tab content
+        
+            st.image(charts.render(charts.customer_segmentation, filtered_summary()['segment_counts']), width="stretch")
+
+    # Add download excel report button here for better visibility
+    # The workbook is only built when the button is clicked
+    st.download_button(
+        label="Download Excel Report",
+        data=perf.timed("to_excel", lambda: build_excel_report(data_version, filter_spec.fingerprint(), backend, filter_spec)),
+        file_name="customer_transaction_insights_report.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+
+def cohort_tab():
+    # Cohort Analysis tab content
+    with perf.span("cohort"):
         st.header("Cohort Analysis")
         # Implement cohort analysis visualization here
         st.markdown("This section provides cohort analysis visualizations to track customer lifecycle and behavior over time, helping identify retention and engagement patterns.")
         # Example: cohort analysis by month and customer type
-        cohort_data = df.copy()
-        cohort_data['purchase_month'] = cohort_data['purchase_date'].dt.to_period('M')
-        cohort_counts = cohort_data.groupby(['purchase_month', 'is_returning_customer']).size().unstack(fill_value=0)
+        cohort_counts = snapshot['cohort_counts'] if snapshot is not None else backend.monthly_customer_type_counts()
         st.line_chart(cohort_counts)
 
-    with tabs[3]:
-        # Churn Summary tab content
-        st.header("Churn Summary")
-        churn_threshold_val = churn_threshold
-        churned_customers = filtered_df[filtered_df['previous_purchases'] <= churn_threshold_val]
-        churn_summary = churned_customers['is_returning_customer'].value_counts().rename({0: 'New', 1: 'Returning'})
-
-        # Additional KPIs
-        total_churned = churned_customers.shape[0]
-        total_customers = filtered_df.shape[0]
-        churn_rate = (total_churned / total_customers) * 100 if total_customers > 0 else 0
-
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Churned Customers", total_churned)
-        with col2:
-            st.metric("Total Customers", total_customers)
-        with col3:
-            st.metric("Churn Rate (%)", f"{churn_rate:.2f}")
-
-        # Bar chart of churn summary
-        st.subheader("Churned Customers by Customer Type")
-        if total_churned == 0:
-            st.write("No churned customers to display in the bar chart.")
-        else:
-            st.bar_chart(churn_summary)
+        if BACKEND == 'pandas' and not partitioned:
+            # Exact and unfiltered, from the ingestor's first-purchase dates,
+            # which appended rows update without a rescan
+            st.subheader("New Customers per First-Purchase Month")
+            cohort_sizes = live.ingestor.cohort_sizes()
+            st.bar_chart(cohort_sizes.set_axis(cohort_sizes.index.to_timestamp()))
+
+        if approximate:
+            # Mergeable HyperLogLog sketches per month instead of exact distinct counts
+            sketches = get_customer_sketches(data_version, backend)
+            all_customers = union_sketch(sketches)
+            low, high = all_customers.bounds()
+            st.subheader("Active Customers per Month (estimated)")
+            st.metric("Distinct customers (≈)", f"{all_customers.estimate():,.0f}", help=f"95% bounds: {low:,.0f} – {high:,.0f}")
+            st.line_chart(sketch_estimates(sketches))
+            st.caption(f"HyperLogLog estimates with 95% bounds (±{1.96 * all_customers.relative_error:.1%}).")
+
+            cohort_estimate, cohort_retention, cohort_error = get_approx_cohorts(data_version, backend)
+            st.subheader("Customer Cohorts (estimated)")
+            st.dataframe(cohort_retention.style.format("{:.0%}", na_rep=""))
+            if not cohort_error.empty:
+                st.caption(f"Cohort sizes are scaled up from a hashed customer sample; cells are within ±{cohort_error.max().max():,.0f} customers (95%).")
+
+
+def churn_summary_tab():
+    # Churn Summary tab content
+    st.header("Churn Summary")
+    churn_threshold_val = churn_threshold
+    summary = filtered_summary()
+    churn_curve, churn = filtered_churn(summary)
+    churn_summary = churn['churned']
+    churn_values = [int(churn_summary['New']), int(churn_summary['Returning'])]
+
+    # Additional KPIs
+    total_churned = churn['total_churned']
+    total_customers = summary['total_transactions']
+    churn_rate = churn['churn_rate']
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Churned Customers", total_churned)
+    with col2:
+        st.metric("Total Customers", total_customers)
+    with col3:
+        st.metric("Churn Rate (%)", f"{churn_rate:.2f}")
+
+    # Bar chart of churn summary
+    st.subheader("Churned Customers by Customer Type")
+    if total_churned == 0:
+        st.write("No churned customers to display in the bar chart.")
+    else:
+        st.bar_chart(churn_summary)
+
+    # Pie chart for churn distribution
+    st.subheader("Churn Distribution")
+    if sum(churn_values) == 0:
+        st.write("No churned customers to display in the pie chart.")
+    else:
+        st.image(charts.render(charts.churn_distribution, churn_values), width="stretch")
+
+    # Churn rate for every possible threshold, read straight off the curve
+    st.subheader("Churn Rate by Threshold")
+    st.caption(f"Share of filtered transactions counted as churned at each threshold; the current threshold is {churn_threshold}.")
+    if total_customers == 0 or churn_curve.empty:
+        st.write("No transactions to sweep thresholds over.")
+    else:
+        churn_sweep = churn_curve.assign(All=churn_curve.sum(axis=1)) / total_customers * 100
+        st.line_chart(churn_sweep)
+
+    # Textual insights
+    st.markdown(
+        f"""
+        <div class="kpi-insight-prominent">
+        <strong>Insights:</strong>
+        <ul>
+            <li>Churn rate is {churn_rate:.2f}% based on the threshold of {churn_threshold_val} previous purchases.</li>
+            <li>Returning customers constitute {churn['returning_share']:.1f}% of churned customers.</li>
+            <li>New customers constitute {churn['new_share']:.1f}% of churned customers.</li>
+        </ul>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+
+@st.fragment
+def raw_data_tab():
+    # Raw Data tab content
+    st.header("Raw Data")
+    st.markdown("This section displays the raw transaction data in a tabular format with interactive filters. Users can explore individual records and download the filtered dataset as an Excel file for offline analysis.")
+    # Only the visible page is sent to the browser; search and sort run
+    # server-side and just produce an array of row positions
+    search_col, sort_col, order_col, size_col = st.columns([3, 2, 1, 1])
+    raw_search = search_col.text_input("Search", key="raw_search", placeholder="Text in any column")
+    raw_sort = sort_col.selectbox("Sort by", options=["(none)"] + options['columns'], key="raw_sort")
+    raw_ascending = order_col.radio("Order", options=["Asc", "Desc"], key="raw_order") == "Asc"
+    page_size = size_col.selectbox("Rows per page", options=[25, 50, 100, 500], index=1, key="raw_page_size")
+
+    raw_query = (raw_search.strip(), None if raw_sort == "(none)" else raw_sort, raw_ascending)
+    # The keyed widget state is the only source of the page number
+    page = st.session_state.setdefault("raw_page", 1)
+    with perf.span("raw_data_page"):
+        page_df, total_rows = backend.page(*raw_query, page, page_size)
+        total_pages = max(1, -(-total_rows // page_size))
+        if page > total_pages:
+            page = st.session_state["raw_page"] = 1
+            page_df, total_rows = backend.page(*raw_query, page, page_size)
+    page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key="raw_page")
+    st.dataframe(page_df)
+    first_row = min((page - 1) * page_size + 1, total_rows)
+    st.caption(f"Rows {first_row:,}–{min(page * page_size, total_rows):,} of {total_rows:,} (page {page} of {total_pages})")
+
+    # Exports are streamed in chunks and only generated on click
+    export_format = st.selectbox("Export format", options=list(EXPORT_FORMATS), key="raw_export_format")
+    extension, mime = EXPORT_FORMATS[export_format]
+    st.download_button(
+        label=f"Download data as {export_format}",
+        data=perf.timed("raw_data_export", lambda: backend.export(export_format, BytesIO(), *raw_query).getvalue()),
+        file_name=f"shopping_trends.{extension}",
+        mime=mime,
+    )
+
+
+def data_dictionary_tab():
+    # Data Dictionary tab content
+    st.header("Data Dictionary")
+    st.write("Data dictionary for dataset columns.")
+    data_dict = {
+        "customer_id": "Unique identifier for each customer",
+        "age": "Age of the customer",
+        "gender": "Gender of the customer",
+        "item_purchased": "Item purchased by the customer",
+        "category": "Category of the purchased item",
+        "purchase_amount_(usd)": "Amount spent in USD",
+        "location": "Customer location",
+        "size": "Size of the item",
+        "color": "Color of the item",
+        "season": "Season of purchase",
+        "review_rating": "Customer review rating",
+        "subscription_status": "Subscription status of the customer",
+        "payment_method": "Payment method used",
+        "shipping_type": "Type of shipping selected",
+        "discount_applied": "Whether discount was applied",
+        "promo_code_used": "Whether promo code was used",
+        "previous_purchases": "Number of previous purchases by the customer",
+        "preferred_payment_method": "Customer's preferred payment method",
+        "frequency_of_purchases": "Frequency of purchases by the customer",
+        "purchase_date": "Date of purchase",
+        "customer_type": "Type of customer: New or Returning based on previous purchases"
+    }
+    dict_df = pd.DataFrame(list(data_dict.items()), columns=["Column", "Description"])
+    st.table(dict_df)
 
-        # Pie chart for churn distribution
-        st.subheader("Churn Distribution")
-        fig, ax = plt.subplots(figsize=(2, 2))  # Adjust figure size to be smaller and square
-        colors = sns.color_palette('pastel')[0:2]
-        labels = ['New', 'Returning']
-        # Fix: Use string labels to get values from churn_summary since index was renamed
-        values = [churn_summary.get('New', 0), churn_summary.get('Returning', 0)]
-        total = sum(values)
-        if total == 0:
-            st.write("No churned customers to display in the pie chart.")
-        else:
-            ax.pie(values, labels=labels, colors=colors, autopct='%1.1f%%', startangle=140)
-            ax.set_title("Churn Distribution: New vs Returning")
-            st.pyplot(fig)
-
-        # Textual insights
-        st.markdown(
-            f"""
-            <div class="kpi-insight-prominent">
-            <strong>Insights:</strong>
-            <ul>
-                <li>Churn rate is {churn_rate:.2f}% based on the threshold of {churn_threshold_val} previous purchases.</li>
-                <li>Returning customers constitute {(churn_summary.get('Returning', 0) / total_churned * 100) if total_churned > 0 else 0:.1f}% of churned customers.</li>
-                <li>New customers constitute {(churn_summary.get('New', 0) / total_churned * 100) if total_churned > 0 else 0:.1f}% of churned customers.</li>
-            </ul>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-    with tabs[4]:
-        # Raw Data tab content
-        st.header("Raw Data")
-        st.markdown("This section displays the raw transaction data in a tabular format with interactive filters. Users can explore individual records and download the filtered dataset as an Excel file for offline analysis.")
-        raw_df = df.copy()
-        raw_df['is_returning_customer'] = raw_df['customer_type'].map({'new': 0, 'returning': 1})
-        st.dataframe(raw_df)
-        towrite = BytesIO()
-        raw_df.to_excel(towrite, index=False, header=True)
-        towrite.seek(0)
-        st.download_button(label="Download data as Excel", data=towrite, file_name="shopping_trends.xlsx", mime="application/vnd.ms-excel")
-
-    with tabs[5]:
-        # Data Dictionary tab content
-        st.header("Data Dictionary")
-        st.write("Data dictionary for dataset columns.")
-        data_dict = {
-            "customer_id": "Unique identifier for each customer",
-            "age": "Age of the customer",
-            "gender": "Gender of the customer",
-            "item_purchased": "Item purchased by the customer",
-            "category": "Category of the purchased item",
-            "purchase_amount_(usd)": "Amount spent in USD",
-            "location": "Customer location",
-            "size": "Size of the item",
-            "color": "Color of the item",
-            "season": "Season of purchase",
-            "review_rating": "Customer review rating",
-            "subscription_status": "Subscription status of the customer",
-            "payment_method": "Payment method used",
-            "shipping_type": "Type of shipping selected",
-            "discount_applied": "Whether discount was applied",
-            "promo_code_used": "Whether promo code was used",
-            "previous_purchases": "Number of previous purchases by the customer",
-            "preferred_payment_method": "Customer's preferred payment method",
-            "frequency_of_purchases": "Frequency of purchases by the customer",
-            "purchase_date": "Date of purchase",
-            "customer_type": "Type of customer: New or Returning based on previous purchases"
-        }
-        dict_df = pd.DataFrame(list(data_dict.items()), columns=["Column", "Description"])
-        st.table(dict_df)
 
+with st.container():
+    st.markdown('<div class="content">', unsafe_allow_html=True)
+
+    # Metrics precomputed for this data and filter spec by `python compute.py`,
+    # if there are any; otherwise the tabs compute them live
+    snapshot = None if partitioned else load_snapshot(dataset_key(DATA_PATH), filter_spec)
+
+    # Only the selected tab's body runs: switching tabs reruns the script. The
+    # Raw Data tab is a fragment, so its search, sort and paging widgets rerun
+    # that tab alone.
+    tab_bodies = {
+        "Overview": overview_tab,
+        "Analytics": analytics_tab,
+        "Cohort Analysis": cohort_tab,
+        "Churn Summary": churn_summary_tab,
+        "Raw Data": raw_data_tab,
+        "Data Dictionary": data_dictionary_tab,
+    }
+    tabs = st.tabs(list(tab_bodies), key="active_tab", on_change="rerun")
+    for tab, body in zip(tabs, tab_bodies.values()):
+        if tab.open:
+            with tab:
+                body()
+
+# Where this rerun spent its time. Downloads are built on click, so their
+# spans only reach the metrics files.
+with st.sidebar.expander("Performance"):
+    st.checkbox("Trace memory (tracemalloc)", key="trace_memory", value=TRACE_MEMORY,
+                help="Record net and peak allocations per section from the next rerun on. Slows reruns down.")
+    st.caption(f"This rerun: {perf.total_seconds() * 1000:,.0f} ms across {len(perf.spans)} sections")
+    st.dataframe(perf.frame().style.format("{:.3f}"))
+    cache_stats = SHARED_CACHE.stats()
+    st.caption(f"Shared cache (all sessions): {cache_stats['entries']} entries, {cache_stats['mb']:,.1f} of "
+               f"{cache_stats['budget_mb']:,.0f} MB; {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses "
+               f"({cache_stats['hit_rate']:.0%}), {cache_stats['evictions']:,} evictions, "
+               f"{cache_stats['invalidations']:,} invalidated")
+perf.flush()
+
+if profiler is not None:
+    st.session_state.pop("profiler", None)
+    prof_path, report_path = profiler.stop(filter_spec.to_dict(), filter_spec.fingerprint())
+    st.session_state["profiled"] = True
+    st.query_params.pop("profile", None)
+    st.toast(f"Profile of this rerun written to {prof_path} (report: {report_path})")
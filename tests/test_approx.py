@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils import compute_cohort_matrices, load_data
+from approx import (HyperLogLog, approx_cohort_matrices, approximate_counts, estimate_counts, merge_sketches,
+                    period_sketches, stratified_sample, union_sketch)
+
+
+def synthetic_transactions(n=200_000, customers=40_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'customer_id': rng.integers(0, customers, n).astype(str),
+        'purchase_date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+        'is_returning_customer': rng.integers(0, 2, n).astype('int8'),
+        'payment_method': pd.Categorical(rng.choice(['Cash', 'PayPal', 'Venmo'], n)),
+        'previous_purchases': rng.integers(0, 50, n).astype('int8'),
+    })
+
+
+def test_hyperloglog_estimates_and_merges_within_bounds():
+    ids = np.arange(100_000).astype(str)
+    sketch = HyperLogLog().add(ids)
+    low, high = sketch.bounds()
+    assert low <= 100_000 <= high
+    assert HyperLogLog().add(ids[:10]).estimate() == pytest.approx(10, rel=0.05)
+
+    # Overlapping halves merge to the sketch of the union
+    merged = HyperLogLog().add(ids[:60_000]).merge(HyperLogLog().add(ids[40_000:]))
+    assert np.array_equal(merged.registers, sketch.registers)
+
+
+def test_period_sketches_merge_across_partitions():
+    df = synthetic_transactions()
+    exact = df.groupby(df['purchase_date'].dt.to_period('M'))['customer_id'].nunique()
+    halves = [period_sketches(df.iloc[:len(df) // 2]), period_sketches(df.iloc[len(df) // 2:])]
+    merged = merge_sketches(*halves)
+    for period, sketch in merged.items():
+        low, high = sketch.bounds()
+        assert low <= exact[period] <= high, period
+    assert union_sketch(merged).estimate() == pytest.approx(df['customer_id'].nunique(), rel=0.05)
+
+    # Each period's sketch holds exactly that period's customers; categorical
+    # ids hash like their values, so they build the same registers
+    months = df['purchase_date'].dt.to_period('M')
+    sketches = period_sketches(df)
+    categorical = period_sketches(df.assign(customer_id=df['customer_id'].astype('category')))
+    for period, sketch in sketches.items():
+        expected = HyperLogLog().add(df.loc[months == period, 'customer_id'].to_numpy())
+        assert np.array_equal(sketch.registers, expected.registers), period
+        assert np.array_equal(categorical[period].registers, sketch.registers), period
+
+
+def test_stratified_estimates_cover_exact_counts():
+    df = synthetic_transactions()
+    positions, codes, sizes = stratified_sample(df, size=20_000)
+    assert sizes.sum() == len(df)
+    assert 15_000 < len(positions) < 25_000
+
+    estimate = estimate_counts(df['previous_purchases'].take(positions), codes, sizes)
+    exact = df['previous_purchases'].value_counts().sort_index()
+    assert ((estimate['estimate'] - exact).abs() <= estimate['error']).mean() > 0.8
+
+    small = approximate_counts(load_data(use_cache=False), 'payment_method')
+    assert (small['error'] == 0).all()
+
+
+def test_approx_cohorts_scale_hashed_sample():
+    df = synthetic_transactions()
+    counts, retention, error = approx_cohort_matrices(df, sample_rate=0.2, threshold=0)
+    exact, _ = compute_cohort_matrices(df)
+    assert (counts[0].sub(exact[0]).abs() <= error[0] * 2).all()
+    assert retention[0].eq(1).all()
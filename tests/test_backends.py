@@ -0,0 +1,100 @@
+import importlib.util
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from utils import DATA_PATH, load_data, source_version
+from filters import FilterSpec
+from backends import LiveBackend, PandasBackend, SQLBackend, open_backend
+from streaming import TailIngestor
+
+SQL_ENGINES = ['sqlite'] + (['duckdb'] if importlib.util.find_spec('duckdb') else [])
+SPEC = FilterSpec.from_selection(
+    start_date='2023-03-01', end_date='2023-09-30', age_range=(20, 45),
+    payment_methods=['Cash', 'PayPal'], genders=['Male'], customer_types=['Returning'],
+)
+
+
+@pytest.fixture(scope='module')
+def pandas_backend():
+    return PandasBackend(load_data(use_cache=False))
+
+
+@pytest.mark.parametrize('engine', SQL_ENGINES)
+def test_sql_backend_matches_pandas(engine, pandas_backend, tmp_path):
+    backend = open_backend(engine, DATA_PATH, db_path=str(tmp_path / f'{engine}.db'))
+    assert backend.options() == pandas_backend.options()
+
+    summary, expected = backend.summary(SPEC), pandas_backend.summary(SPEC)
+    for key, value in expected.items():
+        if isinstance(value, (pd.Series, pd.DataFrame)):
+            assert pd.DataFrame(summary[key]).to_dict() == pd.DataFrame(value).to_dict(), key
+        else:
+            assert summary[key] == pytest.approx(value, nan_ok=True), key
+
+    assert backend.value_counts('category', SPEC).to_dict() == pandas_backend.value_counts('category', SPEC).to_dict()
+    assert backend.churn_counts(SPEC, 10).to_dict() == pandas_backend.churn_counts(SPEC, 10).to_dict()
+    assert backend.churn_curve(SPEC).to_dict() == pandas_backend.churn_curve(SPEC).to_dict()
+    assert backend.monthly_customer_type_counts().to_dict() == pandas_backend.monthly_customer_type_counts().to_dict()
+    assert sorted(backend.rows(SPEC)['customer_id']) == sorted(pandas_backend.rows(SPEC)['customer_id'])
+
+    page, total = backend.page('paypal', 'age', False, 2, 5)
+    expected_page, expected_total = pandas_backend.page('paypal', 'age', False, 2, 5)
+    assert total == expected_total
+    assert page['age'].tolist() == expected_page['age'].tolist()
+
+    exported = pd.read_csv(BytesIO(backend.export('CSV', BytesIO(), 'paypal').getvalue()))
+    assert len(exported) == expected_total
+
+
+@pytest.mark.parametrize('engine', SQL_ENGINES)
+def test_sql_text_columns_come_from_declared_types(engine, tmp_path):
+    lines = open(DATA_PATH).read().splitlines(keepends=True)
+    row = lines[1].rstrip('\n').split(',')
+    row[lines[0].split(',').index('age')] = ''
+    source = tmp_path / 'transactions.csv'
+    source.write_text(lines[0] + ','.join(row) + '\n' + ''.join(lines[2:]))
+    backend = open_backend(engine, str(source), db_path=str(tmp_path / f'{engine}.db'))
+    text_columns = backend._text_columns()
+    assert 'age' not in text_columns and 'payment_method' in text_columns
+    assert backend.page('paypal', 'age', False, 1, 5)[1] == PandasBackend(load_data(use_cache=False)).page('paypal', None, True, 1, 5)[1]
+
+
+def test_sql_backend_reuses_ingested_database(tmp_path):
+    db_path = str(tmp_path / 'reuse.db')
+    open_backend('sqlite', DATA_PATH, db_path=db_path)
+    reopened = SQLBackend(db_path)
+    assert tuple(reopened.ingest_meta()[1:]) == source_version(DATA_PATH)
+
+
+def test_churn_curve_lookups_match_threshold_filter(pandas_backend):
+    rows = pandas_backend.rows(SPEC)
+    for threshold in [-5, 0, 1, 7, 25, 50, 500]:
+        churned = rows.loc[rows['previous_purchases'] <= threshold, 'is_returning_customer']
+        expected = churned.value_counts().reindex([0, 1], fill_value=0).tolist()
+        assert pandas_backend.churn_counts(SPEC, threshold).tolist() == expected, threshold
+
+
+def test_live_backend_extends_cube_on_append(tmp_path):
+    lines = open(DATA_PATH).read().splitlines(keepends=True)
+    path = tmp_path / 'transactions.csv'
+    path.write_text(''.join(lines[:2001]))
+    live = LiveBackend(TailIngestor(str(path)), namespace=str(path))
+    first = live.current()
+    assert live.current() is first
+
+    with open(path, 'a') as f:
+        f.write(''.join(lines[2001:]))
+    extended = live.current()
+    assert extended is not first and extended.scope[1] == (1, len(lines) - 1)
+    assert len(extended.cube.cells) < len(extended.df)
+
+    fresh = PandasBackend(extended.df)
+    spec = FilterSpec.from_selection(start_date='2023-02-01', end_date='2023-10-31', payment_methods=['Cash', 'Venmo'])
+    assert len(extended.cube.cells) == len(fresh.cube.cells)
+    assert extended.cube.cells_for(spec) is not None
+    for key, value in fresh.summary(spec).items():
+        if isinstance(value, (pd.Series, pd.DataFrame)):
+            assert extended.summary(spec)[key].equals(value), key
+        else:
+            assert extended.summary(spec)[key] == pytest.approx(value), key
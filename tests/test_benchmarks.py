@@ -0,0 +1,30 @@
+import pandas as pd
+from utils import DATA_PATH, load_data
+from benchmarks import check_regressions, generate_transactions, run_benchmarks, write_transactions
+
+
+def test_generated_rows_follow_source_schema(tmp_path):
+    source = pd.read_csv(DATA_PATH)
+    df = generate_transactions(5000, seed=1)
+    assert list(df.columns) == list(source.columns) + ['price']
+    assert set(df['payment_method']) <= set(source['payment_method'])
+    assert (df['is_returning_customer'] == (df['customer_type'] == 'returning')).all()
+    assert df['customer_id'].nunique() < len(df)
+
+    path = write_transactions(str(tmp_path / 'synthetic.csv'), 2500, chunk_size=1000)
+    loaded = load_data(path, use_cache=False)
+    assert len(loaded) == 2500
+    assert loaded['purchase_date'].is_monotonic_increasing
+
+
+def test_run_and_regression_check(tmp_path):
+    current = run_benchmarks([2000], ['filter_chain', 'compute_cohort_table'], data_dir=str(tmp_path), log=None)
+    steps = current['results']['2000']
+    assert set(steps) == {'filter_chain', 'compute_cohort_table'}
+    assert all(step['seconds'] >= 0 and step['peak_mb'] >= 0 for step in steps.values())
+    assert check_regressions(current, current) == []
+
+    slow = {'results': {'2000': {'filter_chain': {'seconds': 1.0, 'peak_mb': 1.0}}}}
+    fast = {'results': {'2000': {'filter_chain': {'seconds': 0.5, 'peak_mb': 1.0}}}}
+    assert check_regressions(slow, fast) == ['filter_chain @ 2000 rows: 0.500s -> 1.000s']
+    assert check_regressions(fast, slow) == []
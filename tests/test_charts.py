@@ -0,0 +1,25 @@
+import matplotlib.pyplot as plt
+import pandas as pd
+import charts
+
+
+def test_render_is_cached_on_aggregate_values(monkeypatch):
+    charts.clear_cache()
+    counts = pd.Series([5, 3], index=['New', 'Returning'])
+    first = charts.render(charts.customer_segmentation, counts)
+    assert first.startswith(b'\x89PNG')
+
+    calls = []
+    monkeypatch.setattr(charts, '_render', lambda *args: calls.append(args) or b'')
+    assert charts.render(charts.customer_segmentation, counts.copy()) == first
+    charts.render(charts.customer_segmentation, pd.Series([5, 4], index=['New', 'Returning']))
+    assert len(calls) == 1
+    assert plt.get_fignums() == []
+
+
+def test_render_cache_is_bounded(monkeypatch):
+    charts.clear_cache()
+    monkeypatch.setattr(charts, 'MAX_CACHED_CHARTS', 2)
+    for n in range(4):
+        charts.render(charts.churn_distribution, [n + 1, 1])
+    assert len(charts._cache) == 2
@@ -0,0 +1,46 @@
+import os
+import shutil
+
+import pandas as pd
+from utils import DATA_PATH, load_data
+from backends import PandasBackend
+from filters import FilterSpec
+from compute import churn_kpis, compute_metrics, dataset_key, load_snapshot, precompute, preset_spec
+
+
+def test_precomputed_snapshots_match_live_metrics(tmp_path):
+    source = tmp_path / 'transactions.csv'
+    shutil.copy(DATA_PATH, source)
+    presets = {'default': {}, 'venmo': {'payment_methods': ['Venmo']}, 'spring': {'start_date': '2023-03-01', 'end_date': '2023-05-31'}}
+    results = precompute(str(source), presets, snapshot_dir=str(tmp_path / 'snapshots'), workers=2)
+    assert set(results) == set(presets)
+
+    backend = PandasBackend(load_data(str(source)))
+    options = backend.options()
+    # The sidebar's untouched state resolves to the default preset's snapshot
+    untouched = FilterSpec.from_selection(
+        start_date=options['date_bounds'][0].date(), end_date=options['date_bounds'][1].date(),
+        age_range=options['age_bounds'], price_range=(None, None), payment_methods=options['payment_method'],
+        genders=options['gender'], categories=options['category'], customer_types=['New', 'Returning'],
+    )
+    key = dataset_key(str(source))
+    for name, filters in [('default', {}), ('spring', presets['spring'])]:
+        spec = untouched if name == 'default' else preset_spec(options, filters)
+        snapshot = load_snapshot(key, spec, snapshot_dir=str(tmp_path / 'snapshots'))
+        live = compute_metrics(backend, spec)
+        assert snapshot['summary']['total_transactions'] == live['summary']['total_transactions']
+        assert snapshot['summary']['payment_counts'].equals(live['summary']['payment_counts'])
+        assert snapshot['churn_curve'].equals(live['churn_curve'])
+        assert snapshot['value_counts']['previous_purchases'].equals(live['value_counts']['previous_purchases'])
+
+    # Snapshots of an older version of the file are not used
+    os.utime(source, ns=(0, 0))
+    assert load_snapshot(dataset_key(str(source)), untouched, snapshot_dir=str(tmp_path / 'snapshots')) is None
+
+
+def test_churn_kpis():
+    curve = pd.DataFrame({'New': [2, 5], 'Returning': [1, 5]}, index=pd.Index([1, 3], name='threshold'))
+    kpis = churn_kpis(curve, 2, total_transactions=20)
+    assert kpis['total_churned'] == 3 and kpis['churn_rate'] == 15
+    assert round(kpis['new_share'], 1) == 66.7
+    assert churn_kpis(curve, 0, total_transactions=0)['churn_rate'] == 0
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+from utils import load_data
+from filters import FilterEngine, FilterSpec
+from cube import TransactionCube, rows_as_cells, summarize
+
+
+def test_cube_summary_matches_raw_rows():
+    df = load_data(use_cache=False)
+    cube = TransactionCube(df)
+    engine = FilterEngine(df)
+    spec = FilterSpec.from_selection(
+        start_date='2023-02-10', end_date='2023-09-03', age_range=(25, 54),
+        payment_methods=['Cash', 'Venmo', 'PayPal'], genders=['Male'], customer_types=['New', 'Returning'],
+    )
+    cells = cube.cells_for(spec)
+    assert cells is not None
+    assert len(cube.cells) <= len(df)
+
+    from_cube = summarize(cells)
+    from_rows = summarize(rows_as_cells(engine.filter(spec)))
+    for key, value in from_cube.items():
+        if isinstance(value, (pd.Series, pd.DataFrame)):
+            assert value.equals(from_rows[key]), key
+        else:
+            assert value == from_rows[key], key
+
+
+def test_cube_falls_back_for_finer_filters():
+    cube = TransactionCube(load_data(use_cache=False))
+    assert cube.cells_for(FilterSpec.from_selection(age_range=(21, 40))) is None
+    assert cube.cells_for(FilterSpec.from_selection(age_range=(0, 200))) is not None
+
+
+def test_cube_full_price_range_excludes_missing_prices():
+    df = load_data(use_cache=False)
+    # The sample data has no price column; derive one with a few gaps
+    df['price'] = df['purchase_amount_(usd)'].astype('float64')
+    df.loc[df.index[:10], 'price'] = float('nan')
+    cube, engine = TransactionCube(df), FilterEngine(df)
+    spec = FilterSpec.from_selection(price_range=(df['price'].min(), df['price'].max()))
+    cells = cube.cells_for(spec)
+    total = summarize(cells if cells is not None else rows_as_cells(engine.filter(spec)))['total_transactions']
+    assert total == len(df) - 10
+
+
+def test_average_previous_purchases_skips_missing_values():
+    df = load_data(use_cache=False)
+    df['previous_purchases'] = df['previous_purchases'].astype('Int32')
+    df.loc[df.index[::7], 'previous_purchases'] = pd.NA
+    spec = FilterSpec.from_selection(age_range=(0, 200))
+    cube = TransactionCube(df)
+    expected = df['previous_purchases'].mean()
+    assert summarize(cube.cells_for(spec))['avg_previous_purchases'] == pytest.approx(expected)
+    assert summarize(rows_as_cells(df))['avg_previous_purchases'] == pytest.approx(expected)
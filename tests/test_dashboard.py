@@ -1,12 +1,24 @@
 import pytest
 import pandas as pd
+from functools import partial
 from io import BytesIO
+import instrumentation
+import utils
 from utils import load_data, to_excel
-import streamlit_app as app
+
+@pytest.fixture(scope='module', autouse=True)
+def app(tmp_path_factory):
+    # Importing the app runs it once; keep the data cache and metrics it writes out of the repo
+    cache_dir = tmp_path_factory.mktemp('cache')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(utils, 'CACHE_DIR', str(cache_dir))
+        patch.setattr(instrumentation, 'Recorder', partial(instrumentation.Recorder, metrics_dir=str(cache_dir / 'metrics')))
+        import streamlit_app
+    return streamlit_app
 
 @pytest.fixture
 def df():
-    return load_data()
+    return load_data(use_cache=False)
 
 def test_filtering_churn_summary(df):
     # Apply filters similar to the app
@@ -71,4 +83,12 @@ def test_data_dictionary_content():
         assert isinstance(k, str) and len(k) > 0
         assert isinstance(v, str) and len(v) > 0
 
+def test_to_excel_report_sheet_round_trips(df):
+    subset = df.head(50)
+    report = pd.read_excel(BytesIO(to_excel(subset)), sheet_name='Report')
+    assert list(report.columns) == list(subset.columns)
+    assert len(report) == len(subset)
+    assert report['previous_purchases'].tolist() == subset['previous_purchases'].tolist()
+    assert (pd.to_datetime(report['purchase_date']) == subset['purchase_date'].reset_index(drop=True)).all()
+
 # Additional tests for other tabs and charts can be added similarly
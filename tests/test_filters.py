@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from utils import date_slice, is_date_sorted, load_data
+from filters import FilterEngine, FilterSpec
+
+
+def naive_filter(df, start_date, end_date, payments, age_range, genders, customer_types):
+    filtered_df = df[
+        (df['purchase_date'] >= pd.to_datetime(start_date)) &
+        (df['purchase_date'] <= pd.to_datetime(end_date)) &
+        (df['payment_method'].isin(payments))
+    ]
+    filtered_df = filtered_df[(filtered_df['age'] >= age_range[0]) & (filtered_df['age'] <= age_range[1])]
+    filtered_df = filtered_df[filtered_df['gender'].isin(genders)]
+    return filtered_df[filtered_df['is_returning_customer'].isin(customer_types)]
+
+
+def test_filter_engine_matches_mask_chain():
+    df = load_data(use_cache=False)
+    engine = FilterEngine(df)
+    spec = FilterSpec.from_selection(
+        start_date='2023-03-01', end_date='2023-06-30', age_range=(25, 40),
+        payment_methods=['Cash', 'PayPal'], genders=['Female'],
+        categories=df['category'].unique(), customer_types=['Returning'],
+    )
+    expected = naive_filter(df, '2023-03-01', '2023-06-30', ['Cash', 'PayPal'], (25, 40), ['Female'], [1])
+    result = engine.filter(spec)
+    pd.testing.assert_frame_equal(result, expected)
+    assert engine.filter(spec) is result
+
+
+def test_filter_engine_full_selection_is_noop():
+    df = load_data(use_cache=False)
+    engine = FilterEngine(df)
+    spec = FilterSpec.from_selection(
+        start_date=df['purchase_date'].min(), end_date=df['purchase_date'].max(),
+        payment_methods=df['payment_method'].unique(), customer_types=['New', 'Returning'],
+    )
+    assert engine.select(spec) is None
+    assert len(engine.filter(FilterSpec.from_selection(payment_methods=[]))) == 0
+
+
+def test_date_sorted_window_matches_mask_chain():
+    df = load_data(use_cache=False)
+    assert is_date_sorted(df)
+    engine = FilterEngine(df)
+    assert engine.date_sorted
+
+    # An unaligned, narrow window combined with other filters
+    spec = FilterSpec.from_selection(start_date='2023-05-03', end_date='2023-05-19', age_range=(30, 60),
+                                     payment_methods=['Cash', 'Venmo'], customer_types=['Returning'])
+    expected = naive_filter(df, '2023-05-03', '2023-05-19', ['Cash', 'Venmo'], (30, 60),
+                            df['gender'].unique(), [1])
+    assert engine.filter(spec).index.equals(expected.index)
+
+    # A date-only filter is a zero-copy slice of the sorted frame
+    view = engine.filter(FilterSpec.from_selection(start_date='2023-03-01', end_date='2023-03-31'))
+    assert view.index.equals(date_slice(df, '2023-03-01', '2023-03-31').index)
+    assert view['purchase_date'].dt.month.eq(3).all()
+    assert np.shares_memory(view['age'].to_numpy(), df['age'].to_numpy())
@@ -0,0 +1,30 @@
+import json
+
+import numpy as np
+from instrumentation import Recorder, span_totals
+
+
+def test_spans_record_time_memory_and_metrics_files(tmp_path):
+    perf = Recorder(trace_memory=True, session='s1', metrics_dir=str(tmp_path))
+    with perf.span('outer'):
+        with perf.span('inner'):
+            block = np.ones(2_000_000)
+            del block
+        kept = np.ones(500_000)
+    spans = perf.frame()
+    assert list(spans.index) == ['inner', 'outer']
+    # inner's 15 MiB peak counts towards outer's even though it was freed
+    assert spans.loc['inner', 'peak_mb'] > 14 and spans.loc['outer', 'peak_mb'] > 14
+    assert 3 < spans.loc['outer', 'memory_delta_mb'] < 5
+    assert len(kept)
+
+    perf.flush()
+    # A span finishing after the flush (a download callback) is written on its own
+    assert perf.timed('export', lambda: 42)() == 42
+    records = [json.loads(line) for line in (tmp_path / 'spans.jsonl').read_text().splitlines()]
+    assert [r['span'] for r in records] == ['inner', 'outer', 'export']
+    assert {r['run'] for r in records} == {perf.run_id} and records[0]['session'] == 's1'
+    assert span_totals()['export'][0] >= 1
+    prom = (tmp_path / 'dashboard.prom').read_text()
+    assert 'dashboard_span_calls_total{span="outer"}' in prom
+    assert '# TYPE dashboard_span_seconds_total counter' in prom
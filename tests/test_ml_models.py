@@ -0,0 +1,81 @@
+import pandas as pd
+from utils import DATA_PATH, load_data
+from ml_models import MLModels, ModelRegistry, StreamingClusterer, cluster_customers, evaluate_cluster_counts, iter_frames
+
+
+def test_registry_reuses_trained_churn_model(tmp_path):
+    df = load_data(use_cache=False)
+    registry = ModelRegistry(str(tmp_path), max_versions=2)
+    preds = MLModels(registry).predict_churn(df)
+    versions = registry.versions('churn')
+    assert len(versions) == 1
+    assert versions[0]['metrics']['train_score'] > 0.9
+
+    # A new instance loads the stored model instead of training again
+    fresh = MLModels(registry)
+    fresh.train_churn_model(df)
+    assert registry.versions('churn')[0]['trained_at'] == versions[0]['trained_at']
+    assert (fresh.predict_churn(df) == preds).all()
+
+
+def test_registry_evicts_and_invalidates(tmp_path):
+    df = load_data(use_cache=False)
+    registry = ModelRegistry(str(tmp_path), max_versions=2)
+    for offset in range(3):
+        MLModels(registry).train_churn_model(df.iloc[offset * 100:])
+    assert len(registry.versions('churn')) == 2
+    # A sidecar caught mid-write by another process is skipped, not fatal
+    (tmp_path / 'churn' / 'partial.json').write_text('{"name": "ch')
+    assert len(registry.versions('churn')) == 2
+    registry.invalidate('churn')
+    assert registry.versions('churn') == []
+
+
+def test_batch_scoring_matches_predict_churn(tmp_path):
+    df = load_data(use_cache=False)
+    models = MLModels()
+    models.train_churn_model(df)
+    expected = models.predict_churn(df)
+
+    scores = pd.concat(models.iter_churn_scores(df, chunk_size=500))
+    assert (scores['churn_prediction'].to_numpy() == expected).all()
+    assert scores['churn_probability'].between(0, 1).all()
+
+    output = tmp_path / "scores.parquet"
+    rows = models.score_churn(DATA_PATH, str(output), chunk_size=1000, n_jobs=2)
+    written = pd.read_parquet(output)
+    assert rows == len(df) == len(written)
+    # The file is in source order while load_data() is sorted by date
+    by_id = pd.Series(expected, index=df['customer_id'].astype(int))
+    assert (written['churn_prediction'].to_numpy() == by_id.loc[written['customer_id']].to_numpy()).all()
+
+
+def test_streaming_clustering_and_k_evaluation():
+    df = load_data(use_cache=False)
+    labels = cluster_customers(df, n_clusters=3, streaming=True, chunk_size=500)
+    assert len(labels) == len(df)
+    assert set(labels) == {0, 1, 2}
+
+    # A one-shot generator is fitted and labelled in a single pass
+    chunks = (df.iloc[start:start + 500] for start in range(0, len(df), 500))
+    assert (cluster_customers(chunks, n_clusters=3, streaming=True, chunk_size=500) == labels).all()
+
+    first = StreamingClusterer(n_clusters=3).fit_stream(df.iloc[:2000], chunk_size=500)
+    warm = StreamingClusterer(init_centers=first.cluster_centers_).partial_fit(df.iloc[2000:])
+    assert warm.cluster_centers_.shape == (3, 2)
+
+    report = evaluate_cluster_counts(DATA_PATH, k_values=(2, 3), chunk_size=1000, sample_size=500, n_jobs=1)
+    assert list(report.index) == [2, 3]
+    assert report.loc[3, 'inertia'] < report.loc[2, 'inertia']
+    assert report['silhouette'].between(-1, 1).all()
+
+
+def test_iter_frames_normalizes_file_headers(tmp_path):
+    raw = pd.read_csv(DATA_PATH, nrows=300)
+    raw.columns = [c.replace('_', ' ').title() for c in raw.columns]
+    raw.to_parquet(tmp_path / 'raw.parquet', index=False)
+    raw.to_csv(tmp_path / 'raw.csv', index=False)
+    for name in ['raw.parquet', 'raw.csv']:
+        chunks = list(iter_frames(str(tmp_path / name), 100, ['age', 'previous_purchases']))
+        assert [list(chunk.columns) for chunk in chunks] == [['age', 'previous_purchases']] * 3, name
+        assert len(cluster_customers(str(tmp_path / name), streaming=True, chunk_size=100)) == 300
@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+from utils import DATA_PATH, load_data
+from partitions import PartitionedDataset
+
+
+def write_monthly_partitions(directory):
+    raw = pd.read_csv(DATA_PATH)
+    months = pd.to_datetime(raw['purchase_date']).dt.strftime('%Y-%m')
+    for month, part in raw.groupby(months):
+        # Mix formats: first half of the year as CSV, second half as Parquet
+        if month < '2023-07':
+            part.to_csv(directory / f'{month}.csv', index=False)
+        else:
+            part.to_parquet(directory / f'{month}.parquet', index=False)
+
+
+def test_partitioned_load_matches_single_file(tmp_path):
+    write_monthly_partitions(tmp_path)
+    df = load_data(str(tmp_path))
+    full = load_data(use_cache=False)
+    assert len(df) == len(full)
+    assert df['purchase_date'].is_monotonic_increasing
+    assert df['payment_method'].value_counts().to_dict() == full['payment_method'].value_counts().to_dict()
+
+
+def test_partitions_are_pruned_by_date_and_metadata_cached(tmp_path):
+    write_monthly_partitions(tmp_path)
+    dataset = PartitionedDataset(str(tmp_path))
+    assert dataset.metadata['rows'].sum() == len(load_data(use_cache=False))
+    assert dataset.prune('2023-03-15', '2023-05-02') == ['2023-03.csv', '2023-04.csv', '2023-05.csv']
+    assert dataset.prune('2023-06-20', '2023-07-01') == ['2023-06.csv', '2023-07.parquet']
+
+    df = dataset.load('2023-03-15', '2023-05-02')
+    assert df['purchase_date'].min() == pd.Timestamp('2023-03-01')
+    assert df['purchase_date'].max() == pd.Timestamp('2023-05-31')
+    assert os.path.exists(tmp_path / '.cache' / 'partitions.json')
+
+    # A fresh instance reuses the cached metadata and rescans the rewritten file
+    (tmp_path / '2023-01.csv').write_text((tmp_path / '2023-01.csv').read_text().split('\n', 1)[0] + '\n')
+    reopened = PartitionedDataset(str(tmp_path))
+    assert reopened.metadata.loc['2023-01.csv', 'rows'] == 0
+    assert reopened.prune('2023-01-01', '2023-01-31') == []
+    assert reopened.payment_methods() == sorted(load_data(use_cache=False)['payment_method'].unique())
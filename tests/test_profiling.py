@@ -0,0 +1,31 @@
+import sys
+import pstats
+import tracemalloc
+
+import pandas as pd
+from filters import FilterSpec
+from profiling import RerunProfiler
+
+
+def test_profiled_rerun_writes_tagged_reports(tmp_path):
+    spec = FilterSpec.from_selection(start_date='2023-01-01', end_date='2023-03-31', payment_methods=['Venmo', 'Cash'])
+    profiler = RerunProfiler(output_dir=str(tmp_path), top_n=5).start()
+    frame = pd.DataFrame({'key': list(range(1000)) * 50, 'value': range(50_000)})
+    frame.groupby('key')['value'].sum()
+    prof_path, report_path = profiler.stop(spec.to_dict(), spec.fingerprint())
+
+    assert not tracemalloc.is_tracing()
+    assert spec.fingerprint() in prof_path
+    assert any('groupby' in func for _, _, func in pstats.Stats(prof_path).stats)
+    report = open(report_path).read()
+    assert '"payment_methods": ["Cash", "Venmo"]' in report
+    assert '"date_range": ["2023-01-01 00:00:00", "2023-03-31 00:00:00"]' in report
+    assert 'Top 5 functions by cumulative' in report and 'allocation sites' in report
+
+
+def test_discarded_profiler_is_switched_off(tmp_path):
+    profiler = RerunProfiler(output_dir=str(tmp_path)).start()
+    profiler.discard()
+    assert sys.getprofile() is None
+    assert not tracemalloc.is_tracing()
+    assert list(tmp_path.iterdir()) == []
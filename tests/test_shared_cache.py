@@ -0,0 +1,94 @@
+import threading
+import time
+
+import numpy as np
+from utils import load_data
+from backends import PandasBackend
+from filters import FilterSpec
+from shared_cache import MIN_ENTRY_BYTES, SharedCache
+
+
+def test_lru_eviction_counters_and_invalidation():
+    cache = SharedCache(budget_mb=1)
+    block = lambda: np.zeros(300_000, dtype=np.uint8)
+    for key in 'abc':
+        cache.get((('data', 1), 'rows', key), block)
+    cache.get((('data', 1), 'rows', 'a'), block)
+    # A fourth block overflows 1 MiB; 'b' is now the least recently used
+    cache.get((('data', 1), 'rows', 'd'), block)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (1, 4, 1, 3)
+    assert stats['mb'] <= 1
+    cache.get((('data', 1), 'rows', 'b'), block)
+    assert cache.stats()['misses'] == 5
+
+    # Too big for the budget: returned, never kept
+    assert len(cache.get((('data', 1), 'rows', 'big'), lambda: np.zeros(2 ** 21, dtype=np.uint8))) == 2 ** 21
+    assert cache.stats()['entries'] == 3
+
+    # Evicts one more 'data' entry; invalidation then drops the other two
+    cache.get((('other', 1), 'rows', 'a'), block)
+    assert cache.invalidate('data', keep_version=2) == 2
+    assert cache.stats()['entries'] == 1
+
+
+def test_concurrent_misses_compute_once():
+    cache = SharedCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 42
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(('s', 'k'), compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [42] * 8 and len(calls) == 1
+    assert cache.stats()['hits'] == 7
+
+
+def test_backends_share_views_and_aggregates():
+    df = load_data(use_cache=False)
+    cache = SharedCache()
+    first = PandasBackend(df, cache=cache, scope=('data', 1))
+    second = PandasBackend(df, cache=cache, scope=('data', 1))
+    spec = FilterSpec.from_selection(payment_methods=['Venmo'])
+    assert second.rows(spec) is first.rows(spec)
+    assert second.summary(spec) is first.summary(spec)
+    assert cache.stats()['hits'] == 2
+
+    # A date-only filter is a slice of the shared frame and costs only the
+    # per-entry minimum
+    dates = FilterSpec.from_selection(start_date='2023-03-01', end_date='2023-03-31')
+    before = cache.bytes
+    assert len(first.rows(dates)) > 0
+    assert cache.bytes - before == MIN_ENTRY_BYTES
+
+
+def test_zero_size_entries_are_evicted():
+    cache = SharedCache(budget_mb=MIN_ENTRY_BYTES * 10 / 2 ** 20)
+    for key in range(50):
+        cache.get((('data', 1), 'rows', key), lambda: None, sizeof=lambda value: 0)
+    assert cache.stats()['entries'] == 10
+
+
+def test_results_invalidated_mid_compute_are_not_stored():
+    cache = SharedCache()
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        release.wait()
+        return 'stale'
+
+    worker = threading.Thread(target=lambda: cache.get((('data', 1), 'summary', 'k'), compute))
+    worker.start()
+    started.wait()
+    assert cache.invalidate('data', keep_version=2) == 1
+    release.set()
+    worker.join()
+    assert cache.stats()['entries'] == 0
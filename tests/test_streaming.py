@@ -0,0 +1,133 @@
+import pytest
+from utils import DATA_PATH, load_data
+from streaming import TailIngestor, TransactionAggregates, iter_csv_chunks, stream_aggregates
+
+
+def test_streamed_aggregates_match_full_frame():
+    df = load_data(use_cache=False)
+    aggregates = stream_aggregates(chunk_size=700)
+
+    assert aggregates.rows == len(df)
+    assert aggregates.distinct_customers == df['customer_id'].nunique()
+    assert aggregates.sums['previous_purchases'] == df['previous_purchases'].sum()
+    assert (aggregates.min_date, aggregates.max_date) == (df['purchase_date'].min(), df['purchase_date'].max())
+    for column in ['payment_method', 'category', 'month', 'day_of_week', 'is_returning_customer']:
+        expected = df[column].value_counts()
+        assert aggregates.value_counts(column).to_dict() == expected[expected > 0].to_dict(), column
+
+    firsts = df.groupby('customer_id')['purchase_date'].min()
+    assert aggregates.first_purchases.to_dict() == firsts.to_dict()
+    cohorts = aggregates.cohort_sizes()
+    assert cohorts.sum() == firsts.notna().sum()
+    assert cohorts.to_dict() == firsts.dt.to_period('M').value_counts().to_dict()
+
+
+def test_merged_aggregates_equal_single_pass():
+    chunks = list(iter_csv_chunks(chunk_size=1000))
+    left, right = TransactionAggregates(), TransactionAggregates()
+    for chunk in chunks[:2]:
+        left.update(chunk)
+    for chunk in chunks[2:]:
+        right.update(chunk)
+    merged = left.merge(right)
+    single = stream_aggregates(chunk_size=1000)
+    assert merged.rows == single.rows
+    assert merged.summary()['payment_counts'].to_dict() == single.summary()['payment_counts'].to_dict()
+    assert merged.cohort_sizes().equals(single.cohort_sizes())
+
+
+def test_tail_ingestor_appends_and_rebuilds(tmp_path):
+    lines = open(DATA_PATH).read().splitlines(keepends=True)
+    path = tmp_path / 'transactions.csv'
+    path.write_text(''.join(lines[:2001]))
+    ingestor = TailIngestor(str(path))
+    assert ingestor.refresh() is None
+    assert ingestor.rows == 2000
+
+    # A partially written line waits for the next refresh
+    with open(path, 'a') as f:
+        f.write(''.join(lines[2001:3000]) + lines[3000][:8])
+    assert ingestor.refresh() == 999
+    with open(path, 'a') as f:
+        f.write(lines[3000][8:] + ''.join(lines[3001:]))
+    assert ingestor.refresh() == len(lines) - 3001 + 1
+    assert ingestor.refresh() == 0
+
+    full = load_data(DATA_PATH, use_cache=False)
+    assert ingestor.rebuilds == 1
+    assert ingestor.frame['purchase_date'].is_monotonic_increasing
+    assert sorted(ingestor.frame['customer_id']) == sorted(full['customer_id'])
+    assert ingestor.frame['payment_method'].value_counts().to_dict() == full['payment_method'].value_counts().to_dict()
+    assert ingestor.aggregates.cohort_sizes().equals(stream_aggregates(DATA_PATH).cohort_sizes())
+
+    path.write_text(''.join(lines[:51]))
+    assert ingestor.refresh() is None
+    assert (ingestor.rows, ingestor.rebuilds) == (50, 2)
+
+
+def test_tail_ingestor_rebuild_leaves_partial_line_for_refresh(tmp_path):
+    lines = open(DATA_PATH).read().splitlines(keepends=True)
+    path = tmp_path / 'transactions.csv'
+    path.write_text(''.join(lines[:101]) + lines[101][:12])
+    ingestor = TailIngestor(str(path))
+    assert ingestor.refresh() is None
+    assert ingestor.rows == 100 and ingestor.frame['purchase_date'].notna().all()
+    assert ingestor.offset == len(''.join(lines[:101]).encode())
+
+    with open(path, 'a') as f:
+        f.write(lines[101][12:] + ''.join(lines[102:201]))
+    assert ingestor.refresh() == 100
+    assert ingestor.rebuilds == 1
+    expected = [line.split(',', 1)[0] for line in lines[1:201]]
+    assert sorted(ingestor.frame['customer_id']) == sorted(expected)
+
+
+def test_chunks_share_load_data_numeric_types():
+    frame = load_data(use_cache=False).set_index('customer_id')
+    chunk = next(iter_csv_chunks(chunk_size=500)).set_index('customer_id')
+    for column in ['purchase_amount_(usd)', 'previous_purchases', 'review_rating']:
+        # Nullable in chunks, the same width as load_data's numpy dtype
+        assert getattr(chunk[column].dtype, 'numpy_dtype', chunk[column].dtype) == frame[column].dtype, column
+        assert (chunk[column].to_numpy() == frame.loc[chunk.index, column].to_numpy()).all(), column
+
+
+def test_chunks_allow_blank_integer_cells(tmp_path):
+    lines = open(DATA_PATH).read().splitlines(keepends=True)
+    header = lines[0].rstrip('\n').split(',')
+    age, previous = header.index('age'), header.index('previous_purchases')
+    row = lines[1].rstrip('\n').split(',')
+    row[age] = row[previous] = ''
+    path = tmp_path / 'transactions.csv'
+    path.write_text(lines[0] + ','.join(row) + '\n' + ''.join(lines[2:101]))
+
+    chunks = list(iter_csv_chunks(str(path), chunk_size=40))
+    assert sum(len(chunk) for chunk in chunks) == 100
+    assert chunks[0]['age'].isna().sum() == 1
+    frame = load_data(str(path), use_cache=False)
+    aggregates = stream_aggregates(str(path), chunk_size=40)
+    assert aggregates.sums['previous_purchases'] == frame['previous_purchases'].sum()
+    assert aggregates.summary()['avg_previous_purchases'] == pytest.approx(frame['previous_purchases'].mean())
+
+
+def test_tail_ingestor_rebuild_ignores_rows_appended_meanwhile(tmp_path, monkeypatch):
+    import streaming
+
+    lines = open(DATA_PATH).read().splitlines(keepends=True)
+    path = tmp_path / 'transactions.csv'
+    path.write_text(''.join(lines[:101]))
+
+    # Every parse races a writer that appends ten more rows
+    appends = [0]
+
+    def load_while_appending(source):
+        frame = load_data(source, use_cache=False)
+        with open(path, 'a') as f:
+            f.write(''.join(lines[101 + appends[0]:111 + appends[0]]))
+        appends[0] += 10
+        return frame
+    monkeypatch.setattr(streaming, 'load_data', load_while_appending)
+
+    ingestor = TailIngestor(str(path))
+    assert ingestor.refresh() is None
+    assert ingestor.rows == 100 and appends == [10]
+    assert ingestor.refresh() == 10
@@ -0,0 +1,108 @@
+import os
+import pandas as pd
+import utils
+from io import BytesIO
+from utils import (DATA_PATH, compute_cohort_matrices, compute_cohort_table, count_values, export_data, load_data,
+                   memory_report, normalize_data, optimize_dtypes, page_rows, raw_data_order)
+
+
+def test_load_data_cache_roundtrip(tmp_path):
+    cache_dir = tmp_path / "cache"
+    uncached = load_data(use_cache=False)
+    first = load_data(cache_dir=str(cache_dir))
+    assert (cache_dir / "shopping_trends.parquet").exists()
+    second = load_data(cache_dir=str(cache_dir))
+    pd.testing.assert_frame_equal(first, uncached)
+    pd.testing.assert_frame_equal(second, uncached)
+
+
+def test_load_data_cache_invalidates_on_change(tmp_path, monkeypatch):
+    src = tmp_path / "data.csv"
+    src.write_text("Customer ID,Purchase Date,Customer Type\n1,2023-01-05,new\n")
+    cache_dir = str(tmp_path / "cache")
+    assert len(load_data(str(src), cache_dir=cache_dir)) == 1
+
+    # Same content with a new mtime is served from the cache
+    os.utime(src, ns=(0, 0))
+    assert len(load_data(str(src), cache_dir=cache_dir)) == 1
+
+    # A read-only cache location still serves the hit
+    def read_only(path, payload):
+        raise PermissionError(path)
+    os.utime(src, ns=(10 ** 9, 10 ** 9))
+    monkeypatch.setattr(utils, '_write_json', read_only)
+    assert len(load_data(str(src), cache_dir=cache_dir)) == 1
+    monkeypatch.undo()
+    assert not [name for name in os.listdir(cache_dir) if name.endswith('.tmp')]
+
+    src.write_text("Customer ID,Purchase Date,Customer Type\n1,2023-01-05,new\n2,2023-02-05,returning\n")
+    df = load_data(str(src), cache_dir=cache_dir)
+    assert len(df) == 2
+    assert df['is_returning_customer'].tolist() == [0, 1]
+
+
+def test_optimize_dtypes_compacts_frame():
+    raw = load_data(use_cache=False)
+    compact = optimize_dtypes(raw.copy())
+    assert isinstance(compact['payment_method'].dtype, pd.CategoricalDtype)
+    assert compact['day_of_week'].cat.ordered
+    assert compact['age'].dtype == 'int8'
+    assert compact['customer_id'].dtype == raw['customer_id'].dtype
+    assert compact['previous_purchases'].sum() == raw['previous_purchases'].sum()
+    # Measures stay wide enough for arithmetic, whatever their values fit in
+    assert compact['purchase_amount_(usd)'].dtype == 'int32'
+    assert ((compact['purchase_amount_(usd)'] * 1000).to_numpy() == raw['purchase_amount_(usd)'].to_numpy() * 1000).all()
+
+    report = memory_report(compact, baseline=normalize_data(pd.read_csv(DATA_PATH)))
+    assert report.loc['total', 'reduction'] > 3
+
+
+def test_cohort_matrices_match_period_arithmetic():
+    df = pd.DataFrame({
+        'customer_id': ['a', 'a', 'a', 'b', 'b', 'c'],
+        'purchase_date': pd.to_datetime(['2023-01-10', '2023-02-01', '2023-04-30',
+                                         '2023-02-15', '2023-03-01', '2023-02-20']),
+    })
+    original_columns = list(df.columns)
+    counts, retention = compute_cohort_matrices(df)
+    assert list(df.columns) == original_columns
+
+    january = counts.loc[pd.Period('2023-01', 'M')]
+    assert january.dropna().to_dict() == {0: 1, 1: 1, 3: 1}
+    assert counts.loc[pd.Period('2023-02', 'M'), 0] == 2
+    assert retention.loc[pd.Period('2023-02', 'M'), 1] == 0.5
+    pd.testing.assert_frame_equal(compute_cohort_table(df), counts)
+
+    quarterly, _ = compute_cohort_matrices(df, freq='Q')
+    assert quarterly.loc[pd.Period('2023Q1', 'Q'), 0] == 3
+    weekly, _ = compute_cohort_matrices(df, freq='W')
+    assert weekly[0].sum() == 3
+
+
+def test_raw_data_paging_and_chunked_export():
+    df = load_data(use_cache=False)
+    positions = raw_data_order(df, search='venmo', sort_by='age', ascending=False)
+    expected = df[(df['payment_method'] == 'Venmo') | (df['preferred_payment_method'] == 'Venmo')]
+    assert len(positions) == len(expected)
+    page = page_rows(df, positions, page=2, page_size=10)
+    assert len(page) == 10
+    assert page['age'].is_monotonic_decreasing
+
+    csv = export_data(df, 'CSV', BytesIO(), positions=positions, chunk_size=100).getvalue()
+    assert len(pd.read_csv(BytesIO(csv))) == len(positions)
+    parquet = export_data(df, 'Parquet', BytesIO(), chunk_size=1000).getvalue()
+    pd.testing.assert_frame_equal(pd.read_parquet(BytesIO(parquet)), df)
+
+
+def test_count_values_matches_value_counts_and_crosstab():
+    df = load_data(use_cache=False)
+    counts = count_values(df, ['previous_purchases', 'payment_method', 'day_of_week', 'review_rating'],
+                          crosstabs=[('payment_method', 'is_returning_customer')])
+    for column in ['previous_purchases', 'payment_method', 'day_of_week', 'review_rating']:
+        expected = df[column].value_counts()
+        assert counts[column][counts[column] > 0].to_dict() == expected[expected > 0].to_dict(), column
+    crosstab = pd.crosstab(df['payment_method'], df['is_returning_customer'])
+    assert counts[('payment_method', 'is_returning_customer')].equals(crosstab.rename_axis(columns='is_returning_customer'))
+
+    weighted = count_values({'day': pd.Series([0, 1, 1, -1])}, weights=[5, 2, 3, 4])['day']
+    assert weighted.to_dict() == {-1: 4, 0: 5, 1: 5}
@@ -1,12 +1,40 @@
+import os
+import json
+import uuid
+import hashlib
+import numpy as np
 import pandas as pd
+import xlsxwriter
 from io import BytesIO
 from datetime import datetime
 from calendar import month_name
 
+# A CSV file, or a directory of date-partitioned CSV/Parquet files (see partitions.py)
+DATA_PATH = os.environ.get("DASHBOARD_DATA_PATH", "shopping_trends.csv")
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", ".cache")
+# Bump whenever the normalized schema changes so stale cache files are rebuilt
+CACHE_VERSION = 3
 
-def load_data():
-    df = pd.read_csv("shopping_trends.csv")
-    df.columns = df.columns.str.strip().str.lower().str.replace(" ", "_")
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+ORDERED_CATEGORIES = {
+    'month_name': list(month_name)[1:],
+    'day_of_week': WEEKDAYS,
+}
+# Identifier columns stay plain strings even though they repeat
+NON_CATEGORICAL_COLUMNS = {'customer_id'}
+MAX_CATEGORY_RATIO = 0.5
+# Amounts and counts that get summed or multiplied keep at least 32-bit
+# integers when downcast, so arithmetic on them cannot wrap around
+MEASURE_COLUMNS = {'purchase_amount_(usd)', 'price', 'previous_purchases'}
+MIN_MEASURE_ITEMSIZE = 4
+
+
+def normalize_column_names(columns):
+    return pd.Index(columns).str.strip().str.lower().str.replace(" ", "_")
+
+
+def normalize_data(df):
+    df.columns = normalize_column_names(df.columns)
 
     if 'customer_type' in df.columns:
         df['is_returning_customer'] = df['customer_type'].map({'new': 0, 'returning': 1})
@@ -23,14 +51,267 @@ def load_data():
     return df
 
 
-def compute_cohort_table(df):
-    df['cohort_month'] = df.groupby('customer_id')['purchase_date'].transform('min').dt.to_period('M')
-    df['order_month'] = df['purchase_date'].dt.to_period('M')
-    df['cohort_index'] = (df['order_month'] - df['cohort_month']).apply(lambda x: x.n)
+def optimize_dtypes(df, max_category_ratio=MAX_CATEGORY_RATIO):
+    # Low-cardinality text becomes `category`, numbers the smallest dtype that
+    # holds every value exactly. Operates in place and returns the frame.
+    for col in df.columns:
+        series = df[col]
+        if col in ORDERED_CATEGORIES:
+            df[col] = pd.Categorical(series, categories=ORDERED_CATEGORIES[col], ordered=True)
+        elif pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        elif pd.api.types.is_integer_dtype(series):
+            df[col] = _widen_measure(col, pd.to_numeric(series, downcast='integer'))
+        elif pd.api.types.is_float_dtype(series):
+            df[col] = _widen_measure(col, _downcast_float(series))
+        elif pd.api.types.is_string_dtype(series) or series.dtype == object:
+            if col in NON_CATEGORICAL_COLUMNS or len(series) == 0:
+                continue
+            if series.nunique(dropna=True) <= max_category_ratio * len(series):
+                df[col] = series.astype('category')
+    return df
+
+
+def _downcast_float(series):
+    values = series.to_numpy()
+    if not np.isnan(values).any() and np.array_equal(values, np.round(values)):
+        return pd.to_numeric(series, downcast='integer')
+    as_float32 = values.astype(np.float32)
+    if np.array_equal(as_float32.astype(values.dtype), values, equal_nan=True):
+        return pd.Series(as_float32, index=series.index, name=series.name)
+    return series
+
+
+def _widen_measure(col, series):
+    if col in MEASURE_COLUMNS and pd.api.types.is_integer_dtype(series) and series.dtype.itemsize < MIN_MEASURE_ITEMSIZE:
+        nullable = isinstance(series.dtype, pd.api.extensions.ExtensionDtype)
+        return series.astype('Int32' if nullable else 'int32')
+    return series
+
+
+def memory_report(df, baseline=None):
+    # Per-column deep memory usage; pass the uncompacted frame as `baseline`
+    # to see the saving of optimize_dtypes column by column.
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': df.memory_usage(index=False, deep=True),
+    })
+    if baseline is not None:
+        report['baseline_dtype'] = baseline.dtypes.astype(str).reindex(report.index)
+        report['baseline_bytes'] = baseline.memory_usage(index=False, deep=True).reindex(report.index)
+    total = report.sum(numeric_only=True)
+    report.loc['total'] = total
+    report.loc['total', report.columns.str.endswith('dtype')] = ''
+    byte_cols = report.columns[report.columns.str.endswith('bytes')]
+    report[byte_cols] = report[byte_cols].astype('int64')
+    if baseline is not None:
+        report['reduction'] = (report['baseline_bytes'] / report['bytes']).round(2)
+    report.index.name = 'column'
+    return report
+
+
+def source_version(path=DATA_PATH):
+    # Cheap change token for in-process caches keyed on the source file
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(path, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}.meta.json"), os.path.join(cache_dir, f"{stem}.parquet")
+
+
+def _read_cache_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _temp_path(path):
+    # Unique per writer, so processes sharing a cache directory never replace
+    # each other's half-written file or lose the rename race
+    return f"{path}.{uuid.uuid4().hex}.tmp"
 
-    cohort_data = df.groupby(['cohort_month', 'cohort_index'])['customer_id'].nunique().reset_index()
-    cohort_pivot = cohort_data.pivot(index='cohort_month', columns='cohort_index', values='customer_id')
-    return cohort_pivot
+
+def _write_json(path, payload):
+    tmp_path = _temp_path(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def sort_by_date(df):
+    # Physically order rows by purchase_date (NaT last) on a fresh RangeIndex so
+    # date ranges become contiguous row intervals; see date_bounds()
+    if 'purchase_date' not in df.columns:
+        return df
+    return df.sort_values('purchase_date', kind='stable', na_position='last', ignore_index=True)
+
+
+def is_date_sorted(df):
+    if 'purchase_date' not in df.columns or not isinstance(df.index, pd.RangeIndex):
+        return False
+    dates = df['purchase_date']
+    n_valid = int(dates.notna().sum())
+    return dates.iloc[:n_valid].is_monotonic_increasing and dates.iloc[n_valid:].isna().all()
+
+
+def append_rows(df, tail):
+    # `df` followed by `tail` (both optimized), keeping categorical columns
+    # categorical by widening to the union of categories, and re-sorting by
+    # date only if the tail lands before the end of `df`
+    df, tail = df.copy(deep=False), optimize_dtypes(tail)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and col in tail.columns:
+            if df[col].cat.ordered:
+                tail[col] = pd.Categorical(tail[col], categories=df[col].cat.categories, ordered=True)
+                continue
+            categories = df[col].cat.categories
+            new_values = pd.Index(tail[col].dropna().unique().astype(categories.dtype)).difference(categories)
+            categories = categories.append(new_values)
+            df[col] = df[col].cat.set_categories(categories)
+            tail[col] = pd.Categorical(tail[col], categories=categories)
+        elif col in tail.columns and isinstance(tail[col].dtype, pd.CategoricalDtype):
+            tail[col] = tail[col].astype(df[col].dtype)
+    combined = pd.concat([df, tail], ignore_index=True)
+    return combined if is_date_sorted(combined) else sort_by_date(combined)
+
+
+def date_bounds(dates, start_date, end_date):
+    # [lo, hi) row interval of an inclusive date range in a date-sorted column.
+    # NaT sorts after every date, so it never falls inside the interval.
+    values = dates.to_numpy() if isinstance(dates, pd.Series) else dates
+    start = pd.Timestamp(start_date).to_datetime64().astype(values.dtype)
+    end = pd.Timestamp(end_date).to_datetime64().astype(values.dtype)
+    return int(np.searchsorted(values, start, side='left')), int(np.searchsorted(values, end, side='right'))
+
+
+def date_slice(df, start_date, end_date):
+    # Rows of a date-sorted frame within [start_date, end_date], as an iloc view
+    lo, hi = date_bounds(df['purchase_date'], start_date, end_date)
+    return df.iloc[lo:hi]
+
+
+def _parse_csv(path):
+    return sort_by_date(optimize_dtypes(normalize_data(pd.read_csv(path))))
+
+
+def load_data(path=DATA_PATH, use_cache=True, cache_dir=None):
+    if os.path.isdir(path):
+        from partitions import PartitionedDataset
+
+        return PartitionedDataset(path, cache_dir=cache_dir).load()
+    if not use_cache:
+        return _parse_csv(path)
+
+    # The normalized frame is cached as Parquet next to a small metadata file.
+    # Size + mtime is the fast check; the content hash is only recomputed when
+    # those change, so a touched-but-identical file never triggers a reparse.
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    meta_path, parquet_path = _cache_paths(path, cache_dir)
+    stat = os.stat(path)
+    meta = _read_cache_meta(meta_path)
+
+    if meta and meta.get('version') != CACHE_VERSION:
+        meta = None
+
+    if meta and os.path.exists(parquet_path) and meta.get('size') == stat.st_size:
+        if meta.get('mtime_ns') == stat.st_mtime_ns:
+            return pd.read_parquet(parquet_path)
+        digest = file_digest(path)
+        if meta.get('sha256') == digest:
+            meta['mtime_ns'] = stat.st_mtime_ns
+            try:
+                _write_json(meta_path, meta)
+            except OSError:
+                # Read-only cache: still a hit, the digest is just checked again next time
+                pass
+            return pd.read_parquet(parquet_path)
+    else:
+        digest = file_digest(path)
+
+    df = _parse_csv(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = _temp_path(parquet_path)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+        _write_json(meta_path, {'version': CACHE_VERSION, 'source': os.path.abspath(path), 'size': stat.st_size,
+                                'mtime_ns': stat.st_mtime_ns, 'sha256': digest})
+    except (ImportError, OSError):
+        # No Parquet engine or read-only location: serve the parsed frame uncached
+        return df
+    return df
+
+
+COHORT_FREQUENCIES = ('W', 'M', 'Q')
+
+
+def _period_ordinals(dates, freq):
+    # Integer period numbers that line up with pandas Period ordinals, so the
+    # cohort arithmetic is plain int64 subtraction instead of Period objects.
+    if freq == 'M':
+        return dates.astype('datetime64[M]').astype('int64')
+    if freq == 'Q':
+        return dates.astype('datetime64[M]').astype('int64') // 3
+    if freq == 'W':
+        # 1970-01-01 is a Thursday; W-SUN periods start on Mondays
+        return (dates.astype('datetime64[D]').astype('int64') + 3) // 7 + 1
+    raise ValueError(f"Unsupported cohort frequency {freq!r}; expected one of {COHORT_FREQUENCIES}")
+
+
+def compute_cohort_matrices(df, freq='M'):
+    # Returns (counts, retention): distinct customers per cohort period and
+    # periods since first purchase, and the same matrix as a share of each
+    # cohort's initial size. Does not modify `df`.
+    dates = df['purchase_date'].to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(dates)
+    periods = _period_ordinals(dates[valid], freq)
+    customers, _ = pd.factorize(df['customer_id'].to_numpy()[valid])
+
+    if len(periods) == 0:
+        empty = pd.DataFrame(index=pd.PeriodIndex([], freq=freq, name='cohort_month'),
+                             columns=pd.Index([], dtype='int64', name='cohort_index'), dtype=float)
+        return empty, empty.copy()
+
+    first = pd.Series(periods).groupby(customers).min().to_numpy()
+    offsets = periods - first[customers]
+
+    # One int64 key per (customer, offset) pair makes the distinct count a
+    # single hash-based unique followed by a bincount over the cohort x offset grid
+    span = int(offsets.max()) + 1
+    pairs = pd.unique(customers.astype('int64') * span + offsets)
+    pair_customers, pair_offsets = np.divmod(pairs, span)
+    pair_cohorts = first[pair_customers]
+
+    cohort_min = int(pair_cohorts.min())
+    n_cohorts = int(pair_cohorts.max()) - cohort_min + 1
+    grid = np.bincount((pair_cohorts - cohort_min) * span + pair_offsets,
+                       minlength=n_cohorts * span).reshape(n_cohorts, span)
+
+    present_rows = grid.any(axis=1)
+    present_cols = grid.any(axis=0)
+    index = pd.PeriodIndex.from_ordinals(np.arange(cohort_min, cohort_min + n_cohorts)[present_rows],
+                                         freq=freq, name='cohort_month')
+    counts = pd.DataFrame(grid[present_rows][:, present_cols], index=index,
+                          columns=pd.Index(np.flatnonzero(present_cols), name='cohort_index'))
+    counts = counts.where(counts > 0).astype(float)
+    retention = counts.div(counts[0], axis=0)
+    return counts, retention
+
+
+def compute_cohort_table(df, freq='M'):
+    return compute_cohort_matrices(df, freq)[0]
 
 
 def compute_monthly_revenue(df):
@@ -44,12 +325,58 @@ def compute_monthly_revenue(df):
     return pd.DataFrame()
 
 
+def _value_codes(series):
+    # (codes, labels): int codes into `labels` with -1 for missing values.
+    # Categoricals reuse their codes; small-range integers are offset by their
+    # minimum so no hashing is needed; anything else is factorized.
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    values = series.to_numpy()
+    if pd.api.types.is_integer_dtype(values.dtype) and len(values):
+        low, high = int(values.min()), int(values.max())
+        if high - low < max(len(values), 1 << 16):
+            return values.astype(np.intp) - low, pd.RangeIndex(low, high + 1)
+    codes, labels = pd.factorize(values, sort=True)
+    return codes, pd.Index(labels)
+
+
+def count_values(frame, columns=None, crosstabs=(), weights=None):
+    # Every requested distribution in one go: np.bincount over value codes per
+    # column, and over the combined code a * len(b) + b per (a, b) crosstab.
+    # `frame` is a DataFrame or a dict of Series; `weights` turns the counts
+    # into sums (e.g. the `count` measure of pre-aggregated cube cells).
+    # Returns {column: Series} and {(a, b): DataFrame}, zero counts included.
+    columns = list(frame.keys() if columns is None else columns)
+    needed = list(dict.fromkeys(columns + [col for pair in crosstabs for col in pair]))
+    codes = {col: _value_codes(frame[col]) for col in needed}
+    weights = None if weights is None else np.asarray(weights, dtype='float64')
+
+    def bincount(keys, size):
+        valid = keys >= 0
+        if valid.all():
+            counts = np.bincount(keys, weights=weights, minlength=size)
+        else:
+            counts = np.bincount(keys[valid], weights=None if weights is None else weights[valid], minlength=size)
+        return np.rint(counts).astype('int64') if weights is not None else counts
+
+    result = {}
+    for col in columns:
+        col_codes, labels = codes[col]
+        result[col] = pd.Series(bincount(col_codes, len(labels)), index=labels.rename(col), name='count')
+    for a, b in crosstabs:
+        (codes_a, labels_a), (codes_b, labels_b) = codes[a], codes[b]
+        combined = np.where((codes_a >= 0) & (codes_b >= 0), codes_a * len(labels_b) + codes_b, -1)
+        grid = bincount(combined, len(labels_a) * len(labels_b)).reshape(len(labels_a), len(labels_b))
+        result[(a, b)] = pd.DataFrame(grid, index=labels_a.rename(a), columns=labels_b.rename(b))
+    return result
+
+
 def to_excel(df):
     output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    workbook = writer.book
+    # constant_memory flushes each row to a temp file as soon as the next one
+    # starts, so the Report sheet never holds more than one row in memory
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
     summary_ws = workbook.add_worksheet('Summary')
-    writer.sheets['Summary'] = summary_ws
 
     bold = workbook.add_format({'bold': True})
     center_bold = workbook.add_format({'bold': True, 'align': 'center'})
@@ -64,8 +391,10 @@ def to_excel(df):
     summary_ws.write(row, 0, "Key Performance Indicators", bold)
     row += 1
 
+    # Segment, month and payment counts from one count_values pass
+    counts = count_values(df, ['is_returning_customer', 'month', 'payment_method'])
     kpis = {
-        'Total Customer Types': df['is_returning_customer'].nunique(),
+        'Total Customer Types': int((counts['is_returning_customer'] > 0).sum()),
         'Total Transactions': df.shape[0],
         'Average Previous Purchases': round(df['previous_purchases'].mean(), 2)
     }
@@ -84,7 +413,7 @@ def to_excel(df):
     summary_ws.write(row, 0, "Segment", header_fmt)
     summary_ws.write(row, 1, "Count", header_fmt)
     row += 1
-    seg_counts = df['is_returning_customer'].value_counts().reindex([0, 1], fill_value=0).rename({0: 'New', 1: 'Returning'})
+    seg_counts = counts['is_returning_customer'].reindex([0, 1], fill_value=0).rename({0: 'New', 1: 'Returning'})
     seg_start_row = row
     for seg, count in seg_counts.items():
         summary_ws.write(row, 0, seg)
@@ -106,7 +435,7 @@ def to_excel(df):
     pie_chart.set_title({'name': 'Customer Segmentation'})
     summary_ws.insert_chart('E5', pie_chart)
 
-    monthly = df['month'].value_counts().reindex(range(1, 13), fill_value=0)
+    monthly = counts['month'].reindex(range(1, 13), fill_value=0)
     monthly.index = [month_name[m] for m in monthly.index]
 
     row += 2
@@ -136,7 +465,8 @@ def to_excel(df):
     line_chart.set_style(10)
     summary_ws.insert_chart('E22', line_chart)
 
-    payment_counts = df['payment_method'].value_counts()
+    payment_counts = counts['payment_method']
+    payment_counts = payment_counts[payment_counts > 0].sort_values(ascending=False, kind='stable')
     row += 2
     summary_ws.write(row, 0, "Payment Method Preferences", bold)
     row += 1
@@ -166,12 +496,137 @@ def to_excel(df):
 
     summary_ws.freeze_panes(3, 0)
 
-    df.to_excel(writer, index=False, sheet_name='Report', startrow=1, header=False)
-    report_ws = writer.sheets['Report']
+    report_ws = workbook.add_worksheet('Report')
+    date_fmt = workbook.add_format({'num_format': 'yyyy-mm-dd'})
     for col_num, col_name in enumerate(df.columns):
         report_ws.write(0, col_num, col_name, header_fmt)
         report_ws.set_column(col_num, col_num, 15)
     report_ws.freeze_panes(1, 0)
+    _write_report_rows(report_ws, df, date_fmt)
 
-    writer.close()
+    workbook.close()
     return output.getvalue()
+
+
+def _column_writer(ws, series, date_fmt):
+    # Pick the typed xlsxwriter call once per column instead of per cell
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return lambda row, col, value: ws.write_datetime(row, col, value, date_fmt)
+    if pd.api.types.is_bool_dtype(series):
+        return ws.write_boolean
+    if pd.api.types.is_numeric_dtype(series):
+        return ws.write_number
+    return lambda row, col, value: ws.write_string(row, col, str(value))
+
+
+def _column_values(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.dt.to_pydatetime()
+    else:
+        values = series.to_numpy(dtype=object)
+    return [None if pd.isna(v) else v for v in values]
+
+
+def _write_report_rows(ws, df, date_fmt, first_row=1, chunk_size=10_000):
+    writers = [_column_writer(ws, df[col], date_fmt) for col in df.columns]
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        columns = [_column_values(chunk[col]) for col in chunk.columns]
+        for offset, values in enumerate(zip(*columns)):
+            row = first_row + start + offset
+            for col_num, value in enumerate(values):
+                if value is not None:
+                    writers[col_num](row, col_num, value)
+
+
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def _text_columns(df):
+    return [col for col in df.columns
+            if isinstance(df[col].dtype, pd.CategoricalDtype)
+            or pd.api.types.is_string_dtype(df[col]) or df[col].dtype == object]
+
+
+def search_rows(df, query):
+    # Positions of rows where any text column contains `query` (case-insensitive).
+    # Categorical columns are matched on their categories, not on every row.
+    mask = np.zeros(len(df), dtype=bool)
+    for col in _text_columns(df):
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories
+            hits = categories[categories.astype(str).str.contains(query, case=False, regex=False)]
+            if len(hits):
+                mask |= series.isin(hits).to_numpy()
+        else:
+            mask |= series.astype(str).str.contains(query, case=False, regex=False).to_numpy(dtype=bool)
+    return np.flatnonzero(mask)
+
+
+def raw_data_order(df, search=None, sort_by=None, ascending=True):
+    # Row positions for the Raw Data view: search hits, optionally sorted on
+    # one column. Only this int array is kept; pages are taken from it.
+    positions = search_rows(df, search) if search else np.arange(len(df))
+    if sort_by:
+        keys = df[sort_by].iloc[positions].reset_index(drop=True)
+        order = keys.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        positions = positions[order]
+    return positions
+
+
+def page_rows(df, positions, page, page_size):
+    start = (page - 1) * page_size
+    return df.take(positions[start:start + page_size])
+
+
+def _iter_chunks(df, positions, chunk_size):
+    total = len(df) if positions is None else len(positions)
+    for start in range(0, total, chunk_size):
+        if positions is None:
+            yield start, df.iloc[start:start + chunk_size]
+        else:
+            yield start, df.take(positions[start:start + chunk_size])
+
+
+def export_data(df, fmt, output, positions=None, chunk_size=100_000):
+    # Stream `df` (or the rows at `positions`) to a binary file-like in chunks,
+    # so neither a full-size selection nor a full text/Arrow copy is ever built
+    chunks = (chunk for _, chunk in _iter_chunks(df, positions, chunk_size))
+    return export_frames(df.iloc[:0], chunks, fmt, output)
+
+
+def export_frames(template, frames, fmt, output):
+    # Write an iterable of same-schema frames as one CSV/Parquet/XLSX file;
+    # `template` is an empty frame that fixes the columns (and Parquet schema)
+    if fmt == 'CSV':
+        output.write(template.to_csv(index=False).encode('utf-8'))
+        for chunk in frames:
+            output.write(chunk.to_csv(index=False, header=False).encode('utf-8'))
+    elif fmt == 'Parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.Schema.from_pandas(template, preserve_index=False)
+        with pq.ParquetWriter(output, schema) as writer:
+            for chunk in frames:
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    elif fmt == 'Excel':
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+        ws = workbook.add_worksheet('Data')
+        header_fmt = workbook.add_format({'bold': True})
+        date_fmt = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+        for col_num, col_name in enumerate(template.columns):
+            ws.write(0, col_num, col_name, header_fmt)
+        row = 1
+        for chunk in frames:
+            _write_report_rows(ws, chunk, date_fmt, first_row=row)
+            row += len(chunk)
+        workbook.close()
+    else:
+        raise ValueError(f"Unsupported export format {fmt!r}; expected one of {list(EXPORT_FORMATS)}")
+    return output